@@ -1,7 +1,10 @@
+import time
+_import_started = time.perf_counter()
+
 import os
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from dotenv import load_dotenv
 import datetime
@@ -9,56 +12,140 @@ import datetime
 # Load environment variables
 load_dotenv()
 
+from application.config import get_config
+
 # Initialize extensions
 db = SQLAlchemy()
-migrate = Migrate()
 login_manager = LoginManager()
 
-def create_app():
+_import_time = time.perf_counter() - _import_started
+
+class StartupTimer:
+    """Records how long each phase of create_app takes"""
+
+    def __init__(self):
+        self.phases = [('import', _import_time)]
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        total = sum(seconds for _, seconds in self.phases)
+        parts = ', '.join(f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in self.phases)
+        return f"Startup took {total * 1000:.1f}ms ({parts})"
+
+def create_app(config_name=None):
+    timer = StartupTimer()
     app = Flask(__name__)
     
-    # Configure Flask app
-    app.config['SECRET_KEY'] = '6810980c2aa8ab8eeb38cd6d23b40756417b11367d85fce4eae1187fac27b1f7'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Configure Flask app from the profile for APP_ENV (see application/config.py)
+    config = get_config(config_name)
+    config.validate()
+    app.config.from_object(config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.engine_options()
+    
+    # Structured JSON logging through a queue, with an ID for every request
+    from application.models.structured_logging import init_logging
+    init_logging(app)
     
-    # Set up file upload folder
+    # Set up file upload folder (its subfolders are created when files are saved)
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'uploads')
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    timer.lap('config')
     
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
+    
+    # Use WAL and the other SQLite connection settings
+    from application.models.sqlite_tuning import init_sqlite_tuning
+    init_sqlite_tuning(app)
+    
+    # Time the SQL statements of each request
+    from application.models.sql_instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app)
+    
+    # Serve Prometheus metrics at /metrics; registered after the SQL
+    # instrumentation so the request's database time is still available
+    from application.models.metrics import init_metrics
+    init_metrics(app)
+    
+    # Flask-Migrate imports Alembic, which only the `flask db` commands and
+    # `flask init-db` (which stamps new databases with it) need
+    if not app.config['FAST_STARTUP'] or click.get_current_context(silent=True):
+        from flask_migrate import Migrate
+        Migrate(app, db)
+        from application.models.schema import init_schema
+        init_schema(app)
     
     # Initialize Login Manager
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
-    # Import models after db initialization
-    from application.models.models import User
+    # Import models after db initialization. The routes import these modules
+    # anyway, so loading them here costs nothing even with FAST_STARTUP
+    from application.models.user_cache import init_user_cache, load_session_user
+    from application.models.passwords import init_password_hashing
+    from application.models.email_queue import init_email_worker
+    from application.models.blob_store import init_blob_store
+    from application.models.grievance_stats import init_grievance_stats
+    from application.models.analytics import init_analytics
+    from application.models.exports import init_exports
+    
+    # Add the password benchmark command
+    init_password_hashing(app)
+    
+    # Cache logged-in users between requests
+    init_user_cache(app)
+    
+    # Start sending queued emails in the background
+    init_email_worker(app)
+    
+    # Register the attachment blob store commands
+    init_blob_store(app)
+    
+    # Add the `flask stats` commands for the grievance counters
+    init_grievance_stats(app)
+    
+    # Add the `flask analytics` commands for the response-time metrics
+    init_analytics(app)
+    
+    # Add the `flask export` commands for CSV exports
+    init_exports(app)
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return load_session_user(user_id)
     
     # Add context processor for datetime
     @app.context_processor
     def inject_now():
         return {'now': datetime.datetime.now()}
+    timer.lap('extensions')
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Create database tables, unless the schema is left to the migrations
+    if not app.config['FAST_STARTUP']:
+        with app.app_context():
+            db.create_all()
+    timer.lap('database')
     
     # Import and register blueprints
     from application.routes.auth_routes import auth_bp
     from application.routes.student_routes import student_bp
     from application.routes.admin_routes import admin_bp
     from application.routes.main_routes import main_bp
+    from application.routes.api_routes import api_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(student_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(main_bp)
+    app.register_blueprint(api_bp)
+    timer.lap('blueprints')
+    
+    app.extensions['startup_timer'] = timer
+    if app.config['STARTUP_REPORT']:
+        app.logger.info(timer.report())
     
     return app 
\ No newline at end of file
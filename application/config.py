@@ -0,0 +1,199 @@
+"""
+Configuration profiles for the application.
+
+create_app() loads DevelopmentConfig, TestingConfig or ProductionConfig, chosen
+by the APP_ENV environment variable (falling back to FLASK_ENV, then
+'development'). Settings are read from the environment when this module is
+imported, after application/__init__.py has loaded .env. Development and
+testing fall back to a fixed, public SECRET_KEY; production refuses to start
+without one.
+
+The database is DATABASE_URL (or SQLALCHEMY_DATABASE_URI). SQLite and
+PostgreSQL are both supported; postgres:// URLs are rewritten to the
+postgresql:// form SQLAlchemy expects.
+
+Connection pool sizing
+----------------------
+Each gunicorn worker process has its own pool. A worker needs one connection
+per request thread (GUNICORN_THREADS) plus one for the email worker thread,
+so that is the default DB_POOL_SIZE. DB_MAX_OVERFLOW allows short bursts
+above it. The most connections the app can open is
+
+    WEB_CONCURRENCY x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+which must stay below the database server's max_connections.
+"""
+import os
+
+def env_flag(name, default):
+    """Read a true/false environment variable"""
+    return os.getenv(name, str(default)).lower() == 'true'
+
+def get_database_url(default):
+    """Get the database URL from the environment, normalised for SQLAlchemy"""
+    url = os.getenv('DATABASE_URL') or os.getenv('SQLALCHEMY_DATABASE_URI') or default
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def build_engine_options(url, pool_size, max_overflow, pool_pre_ping, pool_recycle,
+                         pool_timeout, statement_timeout):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for a database URL.
+
+    In-memory SQLite uses a single shared connection, so it takes no pool
+    settings. statement_timeout (milliseconds, 0 for none) is applied by
+    PostgreSQL to every statement on the connection.
+    """
+    if url.startswith('sqlite') and (url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url):
+        return {}
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_pre_ping': pool_pre_ping,
+        'pool_recycle': pool_recycle,
+        'pool_timeout': pool_timeout,
+    }
+    if url.startswith('postgresql') and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+class Config:
+    """Settings shared by every profile"""
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    SQLALCHEMY_DATABASE_URI = get_database_url('sqlite:///app.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool, per worker process (see the module docstring)
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 1))
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', GUNICORN_THREADS + 1))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 2))
+    DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', False)
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+    DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))  # milliseconds, PostgreSQL only
+
+    # SQLite connection settings (see application/models/sqlite_tuning.py)
+    SQLITE_TUNING = env_flag('SQLITE_TUNING', True)
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -20000))  # pages, or KiB when negative
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes
+
+    # Fast startup trusts the Alembic migrations: it skips db.create_all() and
+    # the trial password hash, and only loads Flask-Migrate and the `flask
+    # init-db` command for `flask` commands. Modules the routes use are still
+    # imported at startup. STARTUP_REPORT logs how long each startup phase took.
+    FAST_STARTUP = env_flag('FAST_STARTUP', False)
+    STARTUP_REPORT = env_flag('STARTUP_REPORT', False)
+
+    # Upload limits: whole request, each attachment, and all attachments on one grievance
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 26 * 1024 * 1024))
+    MAX_ATTACHMENT_SIZE = int(os.getenv('MAX_ATTACHMENT_SIZE', 5 * 1024 * 1024))
+    MAX_GRIEVANCE_UPLOAD_SIZE = int(os.getenv('MAX_GRIEVANCE_UPLOAD_SIZE', 25 * 1024 * 1024))
+
+    # Let a front-end server such as nginx send attachment files (X-Sendfile)
+    USE_X_SENDFILE = env_flag('USE_X_SENDFILE', False)
+
+    # Password hashing: any werkzeug method string, and the number of threads
+    # that verify passwords off the request thread (0, the default, verifies inline)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_SALT_LENGTH = int(os.getenv('PASSWORD_HASH_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0))
+
+    # Logged-in user cache: seconds before a cached user is reloaded, and an
+    # optional Redis URL to share the cache between workers
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+    USER_CACHE_REDIS_URL = os.getenv('USER_CACHE_REDIS_URL')
+
+    # Outbound email worker: 'thread' sends from a background thread in each
+    # web process, 'off' leaves the outbox to `flask email-worker`
+    EMAIL_WORKER = os.getenv('EMAIL_WORKER', 'thread')
+    EMAIL_WORKER_THREADS = int(os.getenv('EMAIL_WORKER_THREADS', 4))
+
+    # Per-request SQL instrumentation (see application/models/sql_instrumentation.py):
+    # statements slower than SLOW_QUERY_MS and statement shapes repeated more
+    # than N_PLUS_ONE_THRESHOLD times in one request are logged
+    SQL_INSTRUMENTATION = env_flag('SQL_INSTRUMENTATION', True)
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 200))
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+    SERVER_TIMING = env_flag('SERVER_TIMING', True)
+
+    # Logging (see application/models/structured_logging.py): LOG_LEVEL for all
+    # loggers, LOG_LEVELS to override single loggers as "name=LEVEL,name=LEVEL",
+    # and LOG_FORMAT 'json' or 'text'
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', 'alembic=WARNING')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+
+    # Prometheus metrics at /metrics (see application/models/metrics.py); when
+    # METRICS_TOKEN is set, scrapers must send it as a bearer token
+    METRICS_ENABLED = env_flag('METRICS_ENABLED', True)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # Response-time targets on the reports page, and how often (seconds) the
+    # metrics are refreshed from new status updates. ANALYTICS_WORKER 'off'
+    # leaves the refresh to a single `flask analytics refresh --interval`
+    # process, 'thread' refreshes from a background thread in each web process
+    SLA_FIRST_RESPONSE_HOURS = float(os.getenv('SLA_FIRST_RESPONSE_HOURS', 48))
+    SLA_RESOLUTION_HOURS = float(os.getenv('SLA_RESOLUTION_HOURS', 336))
+    ANALYTICS_REFRESH_INTERVAL = int(os.getenv('ANALYTICS_REFRESH_INTERVAL', 60))
+    ANALYTICS_WORKER = os.getenv('ANALYTICS_WORKER', 'off')
+
+    @classmethod
+    def engine_options(cls):
+        return build_engine_options(cls.SQLALCHEMY_DATABASE_URI, cls.DB_POOL_SIZE, cls.DB_MAX_OVERFLOW,
+                                    cls.DB_POOL_PRE_PING, cls.DB_POOL_RECYCLE, cls.DB_POOL_TIMEOUT,
+                                    cls.DB_STATEMENT_TIMEOUT)
+
+    @classmethod
+    def validate(cls):
+        """Raise RuntimeError if a setting the profile needs is missing"""
+
+# Signs sessions on developer machines and in tests only; never used in production
+DEV_SECRET_KEY = 'dev-only-secret-key-do-not-use-in-production'
+
+class DevelopmentConfig(Config):
+    """Local development against instance/app.db"""
+    SECRET_KEY = os.getenv('SECRET_KEY', DEV_SECRET_KEY)
+    # The development server is a single process, so it can refresh the metrics itself
+    ANALYTICS_WORKER = os.getenv('ANALYTICS_WORKER', 'thread')
+
+class TestingConfig(Config):
+    """Isolated in-memory database, no background work and cheap password hashes"""
+    TESTING = True
+    SECRET_KEY = os.getenv('SECRET_KEY', DEV_SECRET_KEY)
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+    EMAIL_WORKER = 'off'
+    ANALYTICS_WORKER = 'off'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    WTF_CSRF_ENABLED = False
+
+class ProductionConfig(Config):
+    """Deployed behind gunicorn: migrations manage the schema and connections are checked before use"""
+    FAST_STARTUP = env_flag('FAST_STARTUP', True)
+    DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', True)
+    DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 30000))
+
+    @classmethod
+    def validate(cls):
+        """Refuse to start without a secret key, which would leave sessions unsigned or forgeable"""
+        if not cls.SECRET_KEY:
+            raise RuntimeError("SECRET_KEY must be set in the environment when APP_ENV=production")
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+}
+
+def get_config(name=None):
+    """Get the config class for a profile name, or for APP_ENV/FLASK_ENV when no name is given"""
+    name = name or os.getenv('APP_ENV') or os.getenv('FLASK_ENV') or 'development'
+    try:
+        return CONFIGS[name]
+    except KeyError:
+        raise ValueError(f"Unknown configuration '{name}', expected one of {', '.join(CONFIGS)}")
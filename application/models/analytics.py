@@ -0,0 +1,353 @@
+"""
+Response-time and SLA analytics from the status update history.
+
+Each grievance's history is reduced to one grievance_metrics row (time to
+first response and time to resolution) and grievance_status_durations rows
+(total time spent in each status it has left). The reduction is a single
+streaming pass over status_updates ordered by (grievance_id, created_at), so
+no grievance is loaded on its own.
+
+The metrics tables act as a cache. New grievances and every status update
+mark the grievance metrics_stale in the same transaction, and
+refresh_metrics() recomputes only the stale grievances, clearing the mark in
+the transaction that stores their metrics. A status update that commits
+during a refresh waits for the mark to be cleared and then sets it again, so
+no update is missed however late it commits.
+
+Run the refresh once for the whole site with
+`flask analytics refresh --interval 60` (the default, ANALYTICS_WORKER=off)
+or from a cron job. ANALYTICS_WORKER=thread refreshes from an
+AnalyticsWorker thread in each web process instead, which suits a single
+process such as the development server. The reports page only reads the
+stored metrics. `flask analytics refresh --full` recomputes everything.
+
+Definitions:
+    first response  the first status update after the submission
+    resolution      the first update to a status in RESOLVED_STATUSES
+    time in status  from entering a status to the next update; the current
+                    status of a grievance is not counted until it changes
+"""
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, case, delete, insert, update
+from .models import db, Grievance, StatusUpdate, Department, GrievanceMetric, GrievanceStatusDuration
+
+RESOLVED_STATUSES = ('resolved', 'closed')
+REFRESH_CHUNK_SIZE = 500  # grievances recomputed per transaction
+
+logger = logging.getLogger(__name__)
+
+def claim_stale_grievances(limit=REFRESH_CHUNK_SIZE):
+    """
+    Clear the metrics_stale mark of up to limit grievances and return their ids.
+    The caller recomputes their metrics and commits, or rolls back to keep them stale.
+    """
+    grievance_ids = [grievance_id for grievance_id, in (
+        db.session.query(Grievance.id)
+        .filter(Grievance.metrics_stale.is_(True))
+        .order_by(Grievance.id)
+        .limit(limit)
+        .all()
+    )]
+    if grievance_ids:
+        # updated_at is left alone; it versions what the grievance shows, not its metrics
+        db.session.execute(
+            update(Grievance)
+            .where(Grievance.id.in_(grievance_ids), Grievance.metrics_stale.is_(True))
+            .values(metrics_stale=False, updated_at=Grievance.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    return grievance_ids
+
+def compute_metrics(rows):
+    """
+    Reduce status update rows, ordered by grievance and time, to metrics.
+
+    rows yields (grievance_id, department_id, query_category, submitted_at,
+    update_id, status, created_at). Yields a (metric values, status durations)
+    pair for each grievance.
+    """
+    current = None
+    for grievance_id, department_id, category, submitted_at, update_id, status, created_at in rows:
+        if current is None or current['grievance_id'] != grievance_id:
+            if current is not None:
+                yield _finish_metrics(current)
+            current = {
+                'grievance_id': grievance_id, 'department_id': department_id, 'query_category': category,
+                'submitted_at': submitted_at, 'first_response_seconds': None, 'resolution_seconds': None,
+                'last_update_id': update_id, 'durations': {}, 'status': None, 'since': None,
+            }
+        else:
+            # Close the time spent in the previous status
+            seconds = (created_at - current['since']).total_seconds()
+            current['durations'][current['status']] = current['durations'].get(current['status'], 0) + seconds
+            if current['first_response_seconds'] is None:
+                current['first_response_seconds'] = (created_at - submitted_at).total_seconds()
+        if status in RESOLVED_STATUSES and current['resolution_seconds'] is None:
+            current['resolution_seconds'] = (created_at - submitted_at).total_seconds()
+        current['status'], current['since'] = status, created_at
+        current['last_update_id'] = max(current['last_update_id'], update_id)
+    if current is not None:
+        yield _finish_metrics(current)
+
+def _finish_metrics(state):
+    durations = state.pop('durations')
+    del state['status'], state['since']
+    return state, durations
+
+def _stream_updates(grievance_ids=None):
+    """Stream status update rows in (grievance_id, created_at) order, for some or all grievances"""
+    query = (
+        db.session.query(StatusUpdate.grievance_id, Grievance.department_id, Grievance.query_category,
+                         Grievance.created_at, StatusUpdate.id, StatusUpdate.status, StatusUpdate.created_at)
+        .join(Grievance, StatusUpdate.grievance_id == Grievance.id)
+        .order_by(StatusUpdate.grievance_id, StatusUpdate.created_at, StatusUpdate.id)
+    )
+    if grievance_ids is not None:
+        query = query.filter(StatusUpdate.grievance_id.in_(grievance_ids))
+    return query.yield_per(1000)
+
+def _store_metrics(results):
+    """Replace the metrics of the grievances in results. The caller commits."""
+    grievance_ids = [metric['grievance_id'] for metric, _ in results]
+    db.session.execute(delete(GrievanceStatusDuration).where(GrievanceStatusDuration.grievance_id.in_(grievance_ids)))
+    db.session.execute(delete(GrievanceMetric).where(GrievanceMetric.grievance_id.in_(grievance_ids)))
+    # render_nulls keeps rows without a response or resolution time in the same batch
+    db.session.execute(insert(GrievanceMetric).execution_options(render_nulls=True), [metric for metric, _ in results])
+    durations = [{'grievance_id': metric['grievance_id'], 'status': status, 'seconds': seconds}
+                 for metric, statuses in results for status, seconds in statuses.items()]
+    if durations:
+        db.session.execute(insert(GrievanceStatusDuration), durations)
+
+def refresh_metrics(full=False):
+    """
+    Bring the metrics up to date with the status updates.
+
+    Returns the number of grievances recomputed.
+    """
+    try:
+        if not full:
+            refreshed = 0
+            # One transaction per chunk, so a large backlog never holds locks for long
+            while True:
+                grievance_ids = claim_stale_grievances()
+                if not grievance_ids:
+                    return refreshed
+                results = list(compute_metrics(_stream_updates(grievance_ids).all()))
+                if results:
+                    _store_metrics(results)
+                db.session.commit()
+                refreshed += len(results)
+                if len(grievance_ids) < REFRESH_CHUNK_SIZE:
+                    return refreshed
+
+        db.session.execute(
+            update(Grievance)
+            .where(Grievance.metrics_stale.is_(True))
+            .values(metrics_stale=False, updated_at=Grievance.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(delete(GrievanceStatusDuration))
+        db.session.execute(delete(GrievanceMetric))
+        refreshed = 0
+        batch = []
+        for result in compute_metrics(_stream_updates()):
+            batch.append(result)
+            if len(batch) >= REFRESH_CHUNK_SIZE:
+                _store_metrics(batch)
+                refreshed += len(batch)
+                batch = []
+        if batch:
+            _store_metrics(batch)
+            refreshed += len(batch)
+        db.session.commit()
+        return refreshed
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+class AnalyticsWorker:
+    """Background thread that refreshes the metrics every interval seconds"""
+
+    def __init__(self, app, interval=60):
+        self.app = app
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='analytics-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the worker after its current refresh"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def run(self):
+        """Refresh until stopped"""
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    refresh_metrics()
+                    db.session.remove()
+            except Exception:
+                logger.exception("Analytics worker error")
+            self._stop.wait(self.interval)
+
+def remove_department_metrics(department_id):
+    """Drop the metrics of a department whose grievances are being deleted. The caller commits."""
+    grievance_ids = db.session.query(GrievanceMetric.grievance_id).filter(GrievanceMetric.department_id == department_id)
+    db.session.execute(delete(GrievanceStatusDuration).where(GrievanceStatusDuration.grievance_id.in_(grievance_ids)))
+    db.session.execute(delete(GrievanceMetric).where(GrievanceMetric.department_id == department_id))
+
+def _filter_metrics(query, filters):
+    """
+    Apply report filters to a metrics query: the submission range, the
+    department and the grievance's current status
+    """
+    if filters.start:
+        query = query.filter(GrievanceMetric.submitted_at >= filters.start)
+    if filters.end:
+        query = query.filter(GrievanceMetric.submitted_at < filters.end)
+    if filters.department_id:
+        query = query.filter(GrievanceMetric.department_id == filters.department_id)
+    if filters.status:
+        query = query.filter(GrievanceMetric.grievance_id.in_(
+            db.session.query(Grievance.id).filter(Grievance.status == filters.status)))
+    return query
+
+def get_sla_summary(filters, group_by='department'):
+    """
+    Get response and resolution figures grouped by department or category.
+
+    Returns a list of dicts with the group name, number of grievances, average
+    first response and resolution times in seconds, how many met the first
+    response and resolution targets, and how many are still unresolved past
+    the resolution target.
+    """
+    response_target = current_app.config.get('SLA_FIRST_RESPONSE_HOURS', 48) * 3600
+    resolution_target = current_app.config.get('SLA_RESOLUTION_HOURS', 336) * 3600
+    overdue_before = datetime.utcnow() - timedelta(seconds=resolution_target)
+    if group_by == 'category':
+        group = GrievanceMetric.query_category
+        query = db.session.query(group.label('name'))
+    else:
+        group = GrievanceMetric.department_id
+        query = (
+            db.session.query(func.coalesce(Department.name, 'Unknown').label('name'))
+            .select_from(GrievanceMetric)
+            .outerjoin(Department, GrievanceMetric.department_id == Department.id)
+        )
+    query = query.add_columns(
+        func.count().label('grievances'),
+        func.avg(GrievanceMetric.first_response_seconds).label('avg_first_response'),
+        func.sum(case((GrievanceMetric.first_response_seconds <= response_target, 1), else_=0)).label('responded_in_target'),
+        func.count(GrievanceMetric.first_response_seconds).label('responded'),
+        func.avg(GrievanceMetric.resolution_seconds).label('avg_resolution'),
+        func.sum(case((GrievanceMetric.resolution_seconds <= resolution_target, 1), else_=0)).label('resolved_in_target'),
+        func.count(GrievanceMetric.resolution_seconds).label('resolved'),
+        func.sum(case(((GrievanceMetric.resolution_seconds.is_(None)) & (GrievanceMetric.submitted_at < overdue_before), 1),
+                      else_=0)).label('overdue'),
+    )
+    query = _filter_metrics(query, filters)
+    if group_by != 'category':
+        query = query.group_by(Department.name)
+    rows = query.group_by(group).order_by(func.count().desc()).all()
+    return [row._asdict() for row in rows]
+
+def get_status_durations(filters):
+    """Get the average time spent in each status, in seconds"""
+    query = (
+        db.session.query(GrievanceStatusDuration.status, func.avg(GrievanceStatusDuration.seconds),
+                         func.count(GrievanceStatusDuration.grievance_id))
+        .join(GrievanceMetric, GrievanceStatusDuration.grievance_id == GrievanceMetric.grievance_id)
+    )
+    rows = _filter_metrics(query, filters).group_by(GrievanceStatusDuration.status).all()
+    return {status: {'average': average, 'grievances': count} for status, average, count in rows}
+
+def get_status_durations_by_group(filters, group_by='department'):
+    """
+    Get the average time spent in each status per department or category.
+
+    Returns a list of dicts with the group name and a dict of status to
+    average seconds, ordered by name.
+    """
+    if group_by == 'category':
+        name = GrievanceMetric.query_category
+        query = db.session.query(name.label('name'))
+        groups = (name,)
+    else:
+        name = func.coalesce(Department.name, 'Unknown')
+        query = db.session.query(name.label('name'))
+        groups = (GrievanceMetric.department_id, Department.name)
+    query = (
+        query.add_columns(GrievanceStatusDuration.status, func.avg(GrievanceStatusDuration.seconds))
+        .select_from(GrievanceStatusDuration)
+        .join(GrievanceMetric, GrievanceStatusDuration.grievance_id == GrievanceMetric.grievance_id)
+    )
+    if group_by != 'category':
+        query = query.outerjoin(Department, GrievanceMetric.department_id == Department.id)
+    rows = _filter_metrics(query, filters).group_by(*groups, GrievanceStatusDuration.status).all()
+    durations = {}
+    for group_name, status, average in rows:
+        durations.setdefault(group_name, {})[status] = average
+    return [{'name': group_name, 'durations': durations[group_name]} for group_name in sorted(durations)]
+
+def format_duration(seconds):
+    """Format a number of seconds for the reports page"""
+    if seconds is None:
+        return '-'
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 2 * 86400:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} d"
+
+def init_analytics(app):
+    """Add the `flask analytics` commands, the duration template filter and the refresh worker"""
+    app.cli.add_command(analytics_group)
+    app.add_template_filter(format_duration, 'duration')
+
+    if app.config.get('ANALYTICS_WORKER', 'off') != 'thread':
+        return
+    worker = AnalyticsWorker(app, interval=app.config.get('ANALYTICS_REFRESH_INTERVAL', 60))
+    app.extensions['analytics_worker'] = worker
+
+    # Start on the first request, like the email worker, so CLI commands never start it
+    @app.before_request
+    def start_analytics_worker():
+        worker.start()
+
+@click.group('analytics')
+def analytics_group():
+    """Maintain the response-time analytics."""
+
+@analytics_group.command('refresh')
+@click.option('--full', is_flag=True, help='Recompute every grievance instead of only changed ones.')
+@click.option('--interval', type=float, help='Keep refreshing, waiting this many seconds between refreshes.')
+@with_appcontext
+def refresh_command(full, interval):
+    """Update the grievance metrics from new status updates."""
+    while True:
+        refreshed = refresh_metrics(full=full)
+        db.session.remove()
+        click.echo(f"Recomputed metrics for {refreshed} grievance(s)")
+        if not interval:
+            break
+        full = False
+        time.sleep(interval)
@@ -0,0 +1,181 @@
+"""
+Content-addressed storage for attachment files.
+
+Each distinct file is stored once under uploads/blobs/<aa>/<bb>/<sha256> and
+recorded as a Blob row. Attachments point at a blob, and the blob's ref_count
+tracks how many attachments use it. Blobs whose count drops to zero are
+removed by collect_garbage() or the `flask collect-blobs` command.
+
+Adding or deleting an attachment also moves the grievance's updated_at, which
+the API's ETag and Last-Modified are derived from.
+"""
+from datetime import datetime
+import os
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
+from .models import db, Grievance, Attachment, Blob
+from .metrics import record_upload
+from .upload_utils import write_upload_to_temp
+
+BLOB_FOLDER = 'blobs'
+
+def get_blob_folder():
+    """Get the folder that holds the blob store"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], BLOB_FOLDER)
+
+def get_blob_relative_path(sha256):
+    """Get the path of a blob relative to the upload folder"""
+    return os.path.join(BLOB_FOLDER, sha256[:2], sha256[2:4], sha256)
+
+def get_blob_file(sha256):
+    """Get the absolute path of the file for a blob"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], get_blob_relative_path(sha256))
+
+def get_attachment_file(attachment):
+    """Get the absolute path of the file for an attachment, including ones saved before the blob store"""
+    if attachment.sha256 and attachment.blob_id:
+        return get_blob_file(attachment.sha256)
+    return os.path.abspath(attachment.file_path)
+
+def receive_upload(stream, max_bytes):
+    """
+    Stream an upload into the blob store's temporary folder.
+
+    Returns a tuple of (temporary file path, size in bytes, SHA-256 hex digest)
+    to pass to create_attachment.
+    """
+    started = time.perf_counter()
+    temp_path, size, sha256 = write_upload_to_temp(stream, os.path.join(get_blob_folder(), 'tmp'), max_bytes)
+    record_upload(size, time.perf_counter() - started)
+    return temp_path, size, sha256
+
+def _reference_blob(sha256, size):
+    """Add a reference to the blob for sha256, creating it if needed. The caller commits."""
+    updated = db.session.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256)
+        .values(ref_count=Blob.ref_count + 1)
+    ).rowcount
+    if not updated:
+        db.session.add(Blob(sha256=sha256, size=size, ref_count=1))
+        db.session.flush()
+    return Blob.query.filter_by(sha256=sha256).one()
+
+def create_attachment(grievance_id, filename, temp_path, size, sha256):
+    """
+    Attach an uploaded file to a grievance.
+
+    The blob reference is committed before the file is moved into the store so
+    that collect_garbage can never remove a file that a new attachment is about
+    to use. If an identical file is already stored, the rename simply replaces
+    it with the same content.
+    """
+    try:
+        for attempt in range(2):
+            try:
+                blob = _reference_blob(sha256, size)
+                attachment = Attachment(
+                    filename=filename,
+                    file_path=get_blob_relative_path(sha256),
+                    file_size=size,
+                    sha256=sha256,
+                    blob=blob,
+                    grievance_id=grievance_id
+                )
+                db.session.add(attachment)
+                touch_grievance(grievance_id)
+                db.session.commit()
+                break
+            except IntegrityError:
+                # Another upload of the same file created the blob first
+                db.session.rollback()
+                if attempt:
+                    raise
+    except Exception as e:
+        db.session.rollback()
+        os.remove(temp_path)
+        raise e
+
+    try:
+        final_path = get_blob_file(sha256)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(temp_path, final_path)
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        delete_attachment(attachment.id)
+        raise e
+    return attachment
+
+def touch_grievance(grievance_id):
+    """Mark a grievance as changed now. The caller commits."""
+    db.session.execute(
+        update(Grievance)
+        .where(Grievance.id == grievance_id)
+        .values(updated_at=datetime.utcnow())
+    )
+
+def release_attachment(attachment):
+    """Drop an attachment's reference to its blob. The caller commits."""
+    if attachment.blob_id:
+        db.session.execute(
+            update(Blob)
+            .where(Blob.id == attachment.blob_id)
+            .values(ref_count=Blob.ref_count - 1)
+        )
+
+def delete_attachment(attachment_id):
+    """Delete an attachment and release its blob"""
+    try:
+        attachment = Attachment.query.get(attachment_id)
+        if attachment:
+            release_attachment(attachment)
+            touch_grievance(attachment.grievance_id)
+            db.session.delete(attachment)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+def collect_garbage():
+    """
+    Delete blobs that no attachment uses any more, along with their files.
+
+    Each blob row is deleted with a conditional DELETE and its file removed
+    before the transaction commits, so an upload that references the same
+    content concurrently either keeps the blob alive or waits and recreates it.
+
+    Returns the number of blobs removed.
+    """
+    removed = 0
+    candidates = db.session.query(Blob.id, Blob.sha256).filter(Blob.ref_count <= 0).all()
+    for blob_id, sha256 in candidates:
+        try:
+            deleted = db.session.execute(
+                delete(Blob).where(Blob.id == blob_id, Blob.ref_count <= 0)
+            ).rowcount
+            if deleted:
+                path = get_blob_file(sha256)
+                if os.path.exists(path):
+                    os.remove(path)
+                removed += 1
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+    return removed
+
+def init_blob_store(app):
+    """Add the `flask collect-blobs` command"""
+    app.cli.add_command(collect_blobs_command)
+
+@click.command('collect-blobs')
+@with_appcontext
+def collect_blobs_command():
+    """Remove stored attachment files that are no longer referenced."""
+    removed = collect_garbage()
+    click.echo(f"Removed {removed} unreferenced blob(s)")
@@ -1,7 +1,24 @@
 from datetime import datetime
+from collections import namedtuple
+import base64
+import logging
 import os
 from werkzeug.utils import secure_filename
+from sqlalchemy import func, and_, or_, update
+from sqlalchemy.orm import joinedload, selectinload
 from .models import db, User, Department, Grievance, Attachment, StatusUpdate
+from .blob_store import receive_upload, create_attachment, release_attachment
+from .user_cache import invalidate_session_user
+from .grievance_stats import (
+    record_grievance_created, record_status_change, remove_department_stats,
+    get_stats_total, get_stats_by_status, get_stats_by_department
+)
+from .analytics import remove_department_metrics
+from .metrics import record_grievance_submitted
+from .email_utils import render_grievance_status_update
+from .email_queue import add_email, wake_email_worker
+
+logger = logging.getLogger(__name__)
 
 # User Management Functions
 def create_user(email, password, display_name, role='student'):
@@ -53,6 +70,7 @@ def update_user(user_id, data):
             user.set_password(data['password'])
             
         db.session.commit()
+        invalidate_session_user(user_id)
         return user
     except Exception as e:
         db.session.rollback()
@@ -65,6 +83,7 @@ def delete_user(user_id):
         if user:
             db.session.delete(user)
             db.session.commit()
+            invalidate_session_user(user_id)
     except Exception as e:
         db.session.rollback()
         raise e
@@ -115,8 +134,13 @@ def delete_department(dept_id):
             for g in grievances:
                 if g.status not in ['resolved', 'closed']:
                     raise Exception("Cannot delete department with open grievances. Only allowed if all are resolved or closed.")
-            # Delete all grievances for this department
+            # Delete all grievances for this department, releasing their stored files
+            remove_department_stats(dept_id)
+            remove_department_metrics(dept_id)
             for g in grievances:
+                for attachment in g.attachments:
+                    release_attachment(attachment)
+                    db.session.delete(attachment)
                 db.session.delete(g)
             db.session.delete(dept)
             db.session.commit()
@@ -127,8 +151,14 @@ def delete_department(dept_id):
         raise e
 
 # Grievance Management Functions
-def create_grievance(student_id, title, description, department_id, query_category, attachments=None):
-    """Create a new grievance"""
+def create_grievance(student_id, title, description, department_id, query_category, attachments=None,
+                     failed_attachments=None):
+    """
+    Create a new grievance. The grievance is saved even if some of its
+    attachments cannot be stored; each of those is appended to
+    failed_attachments, when given, as a (filename, error) pair.
+    """
+    stored_files = []
     try:
         if not title:
             title = ''
@@ -138,9 +168,11 @@ def create_grievance(student_id, title, description, department_id, query_catego
             description=description,
             department_id=department_id,
             query_category=query_category,
-            status='pending'
+            status='pending',
+            created_at=datetime.utcnow()
         )
         db.session.add(grievance)
+        record_grievance_created(department_id, grievance.status, grievance.created_at)
         
         # Add initial status update
         status_update = StatusUpdate(
@@ -152,57 +184,127 @@ def create_grievance(student_id, title, description, department_id, query_catego
         
         # Handle attachments
         if attachments:
+            from flask import current_app
             for attachment in attachments:
                 filename = secure_filename(attachment.filename)
-                file_path = os.path.join('uploads', filename)
-                attachment.save(file_path)
-                
-                attach = Attachment(
-                    filename=filename,
-                    file_path=file_path,
-                    grievance=grievance
-                )
-                db.session.add(attach)
+                temp_path, size, sha256 = receive_upload(attachment.stream, current_app.config['MAX_ATTACHMENT_SIZE'])
+                stored_files.append((filename, temp_path, size, sha256))
         
         db.session.commit()
-        return grievance.id
     except Exception as e:
         db.session.rollback()
+        for _, temp_path, _, _ in stored_files:
+            os.remove(temp_path)
         raise e
+    
+    record_grievance_submitted()
+    for filename, temp_path, size, sha256 in stored_files:
+        try:
+            create_attachment(grievance.id, filename, temp_path, size, sha256)
+        except Exception as e:
+            # The grievance is already saved; raising would invite a duplicate resubmission
+            logger.warning("Could not attach %s to grievance %s: %s", filename, grievance.id, e)
+            if failed_attachments is not None:
+                failed_attachments.append((filename, str(e)))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return grievance.id
 
 def get_grievance_by_id(grievance_id):
     """Get grievance by ID"""
     return Grievance.query.get(grievance_id)
 
-def get_student_grievances(student_id):
-    """Get all grievances for a student"""
-    return Grievance.query.filter_by(student_id=student_id).all()
+def get_grievance_detail(grievance_id):
+    """Get a grievance with its department, student, status updates and attachments loaded"""
+    return (
+        Grievance.query
+        .options(
+            joinedload(Grievance.department),
+            joinedload(Grievance.student),
+            selectinload(Grievance.status_updates),
+            selectinload(Grievance.attachments)
+        )
+        .filter(Grievance.id == grievance_id)
+        .first()
+    )
+
+def get_grievance_version(grievance_id):
+    """Get the owner and last update time of a grievance without loading it"""
+    return (
+        db.session.query(Grievance.id, Grievance.student_id, Grievance.updated_at)
+        .filter(Grievance.id == grievance_id)
+        .first()
+    )
+
+def get_grievance_status_updates(grievance_id):
+    """Get the status updates of a grievance, oldest first"""
+    return (
+        StatusUpdate.query
+        .filter(StatusUpdate.grievance_id == grievance_id)
+        .order_by(StatusUpdate.created_at, StatusUpdate.id)
+        .all()
+    )
+
+def get_attachment_by_id(attachment_id):
+    """Get attachment by ID with its grievance"""
+    return (
+        Attachment.query
+        .options(joinedload(Attachment.grievance))
+        .filter(Attachment.id == attachment_id)
+        .first()
+    )
+
+def get_grievance_upload_size(grievance_id):
+    """Get the total size in bytes of the attachments on a grievance"""
+    return (
+        db.session.query(func.coalesce(func.sum(Attachment.file_size), 0))
+        .filter(Attachment.grievance_id == grievance_id)
+        .scalar()
+    )
+
+def get_student_grievances(student_id, limit=None):
+    """Get a student's grievances with their departments, newest first"""
+    query = (
+        Grievance.query
+        .options(joinedload(Grievance.department))
+        .filter(Grievance.student_id == student_id)
+        .order_by(Grievance.created_at.desc(), Grievance.id.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    return query.all()
 
 def get_department_grievances(department_id):
     """Get all grievances for a department"""
     return Grievance.query.filter_by(department_id=department_id).all()
 
-def get_all_grievances():
-    """Get all grievances"""
-    return Grievance.query.all()
-
-def get_open_grievances():
-    """Get all open grievances"""
-    return Grievance.query.filter(Grievance.status != 'resolved').all()
-
 def get_resolved_grievances():
     """Get all resolved grievances"""
     return Grievance.query.filter_by(status='resolved').all()
 
-def update_grievance_status(grievance_id, new_status, note=None):
-    """Update grievance status"""
+def update_grievance_status(grievance_id, new_status, note=None, status_label=None):
+    """
+    Update grievance status. With a status_label, the email telling the
+    student about the change is added to the outbox in the same transaction,
+    so the change is never saved without its notification.
+    """
     try:
         grievance = Grievance.query.get(grievance_id)
         if not grievance:
             raise ValueError("Grievance not found")
             
-        grievance.status = new_status
-        grievance.updated_at = datetime.utcnow()
+        # Change the status only if it is still the one just read, so two
+        # concurrent updates cannot both move the same grievance in the stats
+        old_status = grievance.status
+        changed = db.session.execute(
+            update(Grievance)
+            .where(Grievance.id == grievance.id, Grievance.status == old_status)
+            .values(status=new_status, updated_at=datetime.utcnow(), metrics_stale=True)
+        ).rowcount
+        if not changed:
+            raise ValueError("Grievance was updated at the same time, please try again")
+        record_status_change(grievance.department_id, old_status, new_status, grievance.created_at)
         
         # Add status update
         status_update = StatusUpdate(
@@ -212,8 +314,134 @@ def update_grievance_status(grievance_id, new_status, note=None):
         )
         db.session.add(status_update)
         
+        if status_label is not None:
+            subject, message = render_grievance_status_update(grievance.id, status_label, grievance.title or "")
+            add_email(grievance.student.email, subject, message)
+        
         db.session.commit()
-        return grievance
     except Exception as e:
         db.session.rollback()
-        raise e 
\ No newline at end of file
+        raise e 
+    
+    if status_label is not None:
+        wake_email_worker()
+    return grievance
+
+# Grievance Pagination Functions
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+SORT_OPTIONS = ('newest', 'oldest')
+
+GrievancePage = namedtuple('GrievancePage', ['grievances', 'next_cursor', 'prev_cursor', 'page_size', 'sort'])
+
+def encode_cursor(grievance):
+    """Encode the (created_at, id) position of a grievance as an opaque cursor"""
+    raw = f"{grievance.created_at.isoformat()}|{grievance.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor into a (created_at, id) tuple, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, grievance_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(grievance_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+def paginate_grievances(status=None, open_only=False, department_id=None, student_id=None,
+                        after=None, before=None, page_size=DEFAULT_PAGE_SIZE, sort='newest'):
+    """
+    Get one page of grievances using keyset pagination on (created_at, id).
+
+    Pass the ``next_cursor`` of a page as ``after`` to get the following page,
+    or its ``prev_cursor`` as ``before`` to go back. Only ``page_size + 1`` rows
+    are read whatever the position, so the cost does not grow with the table.
+    """
+    if sort not in SORT_OPTIONS:
+        sort = 'newest'
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        page_size = DEFAULT_PAGE_SIZE
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    query = Grievance.query.options(joinedload(Grievance.department))
+    if status:
+        query = query.filter(Grievance.status == status)
+    if open_only:
+        query = query.filter(Grievance.status != 'resolved')
+    if department_id:
+        query = query.filter(Grievance.department_id == department_id)
+    if student_id:
+        query = query.filter(Grievance.student_id == student_id)
+
+    # Walking backwards is the same as walking forwards in the opposite order
+    backwards = before is not None
+    descending = (sort == 'newest') != backwards
+    cursor = decode_cursor(before if backwards else after) if (before or after) else None
+
+    if cursor:
+        created_at, grievance_id = cursor
+        if descending:
+            query = query.filter(or_(
+                Grievance.created_at < created_at,
+                and_(Grievance.created_at == created_at, Grievance.id < grievance_id)
+            ))
+        else:
+            query = query.filter(or_(
+                Grievance.created_at > created_at,
+                and_(Grievance.created_at == created_at, Grievance.id > grievance_id)
+            ))
+
+    if descending:
+        query = query.order_by(Grievance.created_at.desc(), Grievance.id.desc())
+    else:
+        query = query.order_by(Grievance.created_at.asc(), Grievance.id.asc())
+
+    rows = query.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(rows[-1])
+        if (has_more and backwards) or (after and not backwards):
+            prev_cursor = encode_cursor(rows[0])
+
+    return GrievancePage(rows, next_cursor, prev_cursor, page_size, sort)
+
+# Aggregate Query Functions
+def count_grievances():
+    """Get the total number of grievances"""
+    return get_stats_total()
+
+def get_status_counts():
+    """Get grievance counts grouped by status"""
+    return get_stats_by_status()
+
+def get_department_counts():
+    """Get grievance counts grouped by department name"""
+    return get_stats_by_department()
+
+def get_student_status_counts(student_id):
+    """Get one student's grievance counts grouped by status"""
+    rows = (
+        db.session.query(Grievance.status, func.count(Grievance.id))
+        .filter(Grievance.student_id == student_id)
+        .group_by(Grievance.status)
+        .all()
+    )
+    return {status: count for status, count in rows}
+
+def get_recent_grievances(limit=10):
+    """Get the most recently submitted grievances with their departments"""
+    return (
+        Grievance.query
+        .options(joinedload(Grievance.department))
+        .order_by(Grievance.created_at.desc(), Grievance.id.desc())
+        .limit(limit)
+        .all()
+    )
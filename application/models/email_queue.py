@@ -0,0 +1,229 @@
+"""
+Outbound email queue.
+
+Emails are written to the email_outbox table inside the request and sent later
+by an EmailWorker, either a background thread in each web process or a
+separate `flask email-worker` process. Failed sends are retried with
+exponential backoff until MAX_ATTEMPTS is reached.
+"""
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import update
+from .models import db, EmailOutbox
+from .email_utils import send_batch, get_smtp_pool, EMAIL_BACKEND
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = 30  # seconds, doubled after every failed attempt
+RETRY_MAX_DELAY = 3600
+SEND_LEASE = 300  # seconds before a claimed email may be claimed again
+BATCH_SIZE = 20
+CONNECTION_BATCH_SIZE = 5  # emails sent over one pooled SMTP connection in a row
+
+logger = logging.getLogger(__name__)
+
+def add_email(recipient, subject, message, from_email=None):
+    """
+    Add an email to the outbox in the current session without committing, so
+    it is saved in the same transaction as the change it reports. Call
+    wake_email_worker() after the commit.
+    """
+    email = EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        body=message,
+        from_email=from_email
+    )
+    db.session.add(email)
+    return email
+
+def wake_email_worker():
+    """Ask the worker in this process to send newly committed emails now"""
+    worker = current_app.extensions.get('email_worker')
+    if worker:
+        worker.wake()
+
+def enqueue_email(recipient, subject, message, from_email=None):
+    """Add an email to the outbox in its own transaction and wake the worker in this process"""
+    try:
+        email = add_email(recipient, subject, message, from_email)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+    wake_email_worker()
+    return email.id
+
+def retry_delay(attempts):
+    """Get the number of seconds to wait after the given number of failed attempts"""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+def claim_emails(batch_size=BATCH_SIZE):
+    """
+    Claim up to batch_size emails that are due for sending.
+
+    An email is claimed by moving its next_attempt_at forward by SEND_LEASE in a
+    conditional UPDATE, so several workers can poll the same outbox without
+    sending an email twice. Emails left in 'sending' by a worker that died are
+    picked up again once their lease runs out.
+    """
+    now = datetime.utcnow()
+    due = (
+        db.session.query(EmailOutbox.id, EmailOutbox.next_attempt_at)
+        .filter(EmailOutbox.status.in_(['pending', 'sending']))
+        .filter(EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+        .all()
+    )
+    claimed = []
+    try:
+        for email_id, next_attempt_at in due:
+            result = db.session.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == email_id, EmailOutbox.next_attempt_at == next_attempt_at)
+                .values(status='sending',
+                        attempts=EmailOutbox.attempts + 1,
+                        next_attempt_at=now + timedelta(seconds=SEND_LEASE))
+            )
+            if result.rowcount:
+                claimed.append(email_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+    if not claimed:
+        return []
+    return EmailOutbox.query.filter(EmailOutbox.id.in_(claimed)).all()
+
+def process_outbox(executor=None, batch_size=BATCH_SIZE):
+    """
+    Send one batch of due emails and record the results.
+
+    Returns the number of emails attempted.
+    """
+    emails = claim_emails(batch_size)
+    if not emails:
+        return 0
+
+    # Split the batch so each sender thread reuses one connection for several emails
+    payloads = [(e.recipient, e.subject, e.body, e.from_email) for e in emails]
+    chunks = [payloads[i:i + CONNECTION_BATCH_SIZE] for i in range(0, len(payloads), CONNECTION_BATCH_SIZE)]
+    chunk_results = executor.map(send_batch, chunks) if executor else map(send_batch, chunks)
+    results = [error for errors in chunk_results for error in errors]
+
+    now = datetime.utcnow()
+    try:
+        for email, error in zip(emails, results):
+            if error is None:
+                email.status = 'sent'
+                email.sent_at = now
+                email.last_error = None
+            elif email.attempts >= MAX_ATTEMPTS:
+                email.status = 'failed'
+                email.last_error = error
+                logger.warning("Giving up on email %s to %s: %s", email.id, email.recipient, error)
+            else:
+                email.status = 'pending'
+                email.last_error = error
+                email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+    return len(emails)
+
+class EmailWorker:
+    """Background thread that drains the outbox using a pool of sender threads"""
+
+    def __init__(self, app, threads=4, poll_interval=5.0):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._thread = None
+        self._executor = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='email-sender')
+            self._thread = threading.Thread(target=self.run, name='email-worker', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Ask the worker to check the outbox now instead of at the next poll"""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """Stop the worker after its current batch"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def run(self):
+        """Process batches until stopped, sleeping while the outbox is empty"""
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    processed = process_outbox(self._executor)
+                    db.session.remove()
+            except Exception:
+                logger.exception("Email worker error")
+                processed = 0
+            if not processed:
+                if EMAIL_BACKEND == 'smtp':
+                    get_smtp_pool().close_idle()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+def init_email_worker(app):
+    """Register the email worker with the app and add the `flask email-worker` command"""
+    app.cli.add_command(email_worker_command)
+
+    if app.config.get('EMAIL_WORKER', 'thread') != 'thread':
+        return
+    worker = EmailWorker(app,
+                         threads=app.config.get('EMAIL_WORKER_THREADS', 4),
+                         poll_interval=app.config.get('EMAIL_WORKER_POLL_INTERVAL', 5.0))
+    app.extensions['email_worker'] = worker
+
+    # Start on the first request so CLI commands such as `flask db upgrade`
+    # do not start polling a database that may not be migrated yet
+    @app.before_request
+    def start_email_worker():
+        worker.start()
+
+@click.command('email-worker')
+@click.option('--once', is_flag=True, help='Send the emails that are due and exit.')
+@click.option('--threads', default=4, show_default=True, help='Number of sender threads.')
+@click.option('--poll-interval', default=5.0, show_default=True, help='Seconds between outbox polls.')
+@with_appcontext
+def email_worker_command(once, threads, poll_interval):
+    """Send queued emails from the outbox."""
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='email-sender') as executor:
+        while True:
+            processed = process_outbox(executor)
+            db.session.remove()
+            if processed:
+                click.echo(f"Processed {processed} email(s)")
+                continue
+            if once:
+                break
+            time.sleep(poll_interval)
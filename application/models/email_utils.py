@@ -1,22 +1,258 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from contextlib import contextmanager
+import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from .metrics import record_email_sent, record_email_failed
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # These should be set in your .env file
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_USER = os.getenv('EMAIL_USER', '')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'true').lower() == 'true'
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@dut.ac.za')
 
+# 'smtp' sends through EMAIL_HOST, 'console' logs emails instead of sending them.
+# Set EMAIL_BACKEND=smtp with EMAIL_USE_TLS=false to send to a local SMTP server
+# without credentials, e.g. `python -m aiosmtpd -n -l localhost:8025`.
+# check_email_outbox.py runs the outbox against its own local stand-in.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'smtp' if EMAIL_USER and EMAIL_PASSWORD else 'console')
+
+# Email bodies are Jinja templates in templates/email, compiled once per process.
+# auto_reload is off so rendering never has to stat the template files.
+EMAIL_TEMPLATE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'email')
+email_templates = Environment(
+    loader=FileSystemLoader(EMAIL_TEMPLATE_FOLDER),
+    autoescape=select_autoescape(['html']),
+    auto_reload=False
+)
+
+# Logged-in SMTP connections kept open per process, and how long they may sit idle
+EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', 4))
+EMAIL_POOL_MAX_IDLE = int(os.getenv('EMAIL_POOL_MAX_IDLE', 60))
+
+# Errors after which smtplib has reset the session and the connection can be reused
+RECOVERABLE_SMTP_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+class SMTPConnectionPool:
+    """
+    Pool of connected, logged-in SMTP sessions shared by the threads of one process.
+
+    Connections are checked with NOOP before reuse, replaced when they have
+    dropped, and closed once they have been idle for longer than max_idle
+    seconds. At most max_size connections are open at a time.
+    """
+
+    def __init__(self, host, port, user='', password='', use_tls=True, max_size=4, max_idle=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        return server
+
+    def _close(self, server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _is_alive(self, server):
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def acquire(self):
+        """Get a healthy connection, reusing an idle one when possible"""
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    server, last_used = self._idle.pop() if self._idle else (None, None)
+                if server is None:
+                    return self._connect()
+                if time.monotonic() - last_used <= self.max_idle and self._is_alive(server):
+                    return server
+                self._close(server)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, server, broken=False):
+        """Return a connection to the pool, or close it if it is broken"""
+        try:
+            if broken:
+                self._close(server)
+            else:
+                with self._lock:
+                    self._idle.append((server, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with block"""
+        server = self.acquire()
+        try:
+            yield server
+        except RECOVERABLE_SMTP_ERRORS:
+            self.release(server)
+            raise
+        except Exception:
+            self.release(server, broken=True)
+            raise
+        self.release(server)
+
+    def close_idle(self):
+        """Close connections that have been idle for longer than max_idle"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [item for item in self._idle if now - item[1] > self.max_idle]
+            self._idle = [item for item in self._idle if now - item[1] <= self.max_idle]
+        for server, _ in expired:
+            self._close(server)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+_smtp_pool = None
+_smtp_pool_lock = threading.Lock()
+
+def get_smtp_pool():
+    """Get the SMTP connection pool for this process"""
+    global _smtp_pool
+    if _smtp_pool is None:
+        with _smtp_pool_lock:
+            if _smtp_pool is None:
+                _smtp_pool = SMTPConnectionPool(EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD,
+                                                use_tls=EMAIL_USE_TLS,
+                                                max_size=EMAIL_POOL_SIZE,
+                                                max_idle=EMAIL_POOL_MAX_IDLE)
+    return _smtp_pool
+
+def build_message(recipient, subject, message, from_email=None):
+    """Build the MIME message for an HTML email"""
+    msg = MIMEMultipart()
+    msg['From'] = from_email or DEFAULT_FROM_EMAIL
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    
+    msg.attach(MIMEText(message, 'html'))
+    return msg
+
+def log_email(recipient, subject, message):
+    """Log an email instead of sending it, for development and testing; the body is logged at DEBUG"""
+    logger.info("Email to %s: %s", recipient, subject)
+    logger.debug("Body of the email to %s:\n%s", recipient, message)
+
+def deliver_email(recipient, subject, message, from_email=None):
+    """
+    Send an email, raising an exception if it cannot be delivered
+    
+    Args:
+        recipient (str): Email address of the recipient
+        subject (str): Email subject
+        message (str): Email message (HTML)
+        from_email (str, optional): Sender email. Defaults to DEFAULT_FROM_EMAIL.
+    """
+    # For development/testing, just log the email instead of sending
+    if EMAIL_BACKEND != 'smtp':
+        log_email(recipient, subject, message)
+        return
+    
+    msg = build_message(recipient, subject, message, from_email)
+    started = time.perf_counter()
+    try:
+        with get_smtp_pool().connection() as server:
+            server.send_message(msg)
+    except Exception:
+        record_email_failed('smtp')
+        raise
+    record_email_sent('smtp', time.perf_counter() - started)
+
+def send_batch(emails):
+    """
+    Send many emails one after another over a single SMTP connection
+    
+    Args:
+        emails (list): (recipient, subject, message, from_email) tuples
+    
+    Returns:
+        list: None for each email that was sent, or the error message for
+        each one that failed, in the same order as emails
+    """
+    emails = list(emails)
+    if EMAIL_BACKEND != 'smtp':
+        for recipient, subject, message, from_email in emails:
+            log_email(recipient, subject, message)
+        return [None] * len(emails)
+    
+    results = []
+    pool = get_smtp_pool()
+    server = None
+    for recipient, subject, message, from_email in emails:
+        started = time.perf_counter()
+        try:
+            if server is None:
+                server = pool.acquire()
+        except Exception as e:
+            # Could not connect, so the rest of the batch will fail the same way
+            for _ in range(len(emails) - len(results)):
+                record_email_failed('smtp')
+            results.extend([str(e) or e.__class__.__name__] * (len(emails) - len(results)))
+            return results
+        try:
+            server.send_message(build_message(recipient, subject, message, from_email))
+            record_email_sent('smtp', time.perf_counter() - started)
+            results.append(None)
+        except RECOVERABLE_SMTP_ERRORS as e:
+            record_email_failed('smtp')
+            results.append(str(e))
+        except Exception as e:
+            # The connection is gone; reconnect for the next email
+            record_email_failed('smtp')
+            pool.release(server, broken=True)
+            server = None
+            results.append(str(e) or e.__class__.__name__)
+    if server is not None:
+        pool.release(server)
+    return results
+
 def send_email(recipient, subject, message, from_email=None):
     """
-    Send an email notification
+    Send an email notification immediately
     
     Args:
         recipient (str): Email address of the recipient
@@ -27,59 +263,51 @@ def send_email(recipient, subject, message, from_email=None):
     Returns:
         bool: True if email sent successfully, False otherwise
     """
-    # For development/testing, just print the email instead of sending
-    if not EMAIL_USER or not EMAIL_PASSWORD:
-        print(f"\n----- EMAIL -----")
-        print(f"To: {recipient}")
-        print(f"Subject: {subject}")
-        print(f"Message: {message}")
-        print(f"----- END EMAIL -----\n")
+    try:
+        deliver_email(recipient, subject, message, from_email)
         return True
+    except Exception as e:
+        logger.error("Could not send email to %s: %s", recipient, e)
+        return False
+
+def queue_email(recipient, subject, message, from_email=None):
+    """
+    Add an email to the outbox for the background email worker to send
     
+    Returns:
+        bool: True if the email was queued, False otherwise
+    """
+    from application.models.email_queue import enqueue_email
     try:
-        msg = MIMEMultipart()
-        msg['From'] = from_email or DEFAULT_FROM_EMAIL
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(message, 'html'))
-        
-        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-        server.starttls()
-        server.login(EMAIL_USER, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        
+        enqueue_email(recipient, subject, message, from_email)
         return True
     except Exception as e:
-        print(f"Error sending email: {e}")
+        logger.error("Could not queue email to %s: %s", recipient, e)
         return False
 
-def send_grievance_status_update(email, grievance_id, new_status, title):
-    """Send email notification about grievance status update"""
-    subject = f"Grievance Status Update - {title}"
-    message = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px;">
-            <div style="text-align: center; margin-bottom: 20px;">
-                <img src="https://www.dut.ac.za/wp-content/uploads/2022/03/DUT-NEW-LOGO.png" alt="DUT Logo" style="max-width: 150px;">
-            </div>
-            <h2 style="color: #004F9F;">Grievance Status Update</h2>
-            <p>Dear Student,</p>
-            <p>The status of your grievance <strong>#{grievance_id}</strong> with title "<strong>{title}</strong>" has been updated to: <strong style="color: #E31837;">{new_status}</strong>.</p>
-            <p>You can login to the Student Grievance Portal to view more details and track the progress of your grievance.</p>
-            <div style="margin-top: 30px; text-align: center;">
-                <a href="#" style="background-color: #004F9F; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; font-weight: bold;">View Grievance</a>
-            </div>
-            <p style="margin-top: 30px; font-size: 0.9em; color: #666; border-top: 1px solid #ddd; padding-top: 15px;">
-                This is an automated message from the DUT Student Grievance Management System. Please do not reply to this email.
-            </p>
-        </div>
-    </body>
-    </html>
+def render_email(template_name, **context):
+    """Render an email body from a template in templates/email"""
+    return email_templates.get_template(template_name).render(**context)
+
+def render_emails(template_name, contexts):
+    """
+    Render one email body per context with the same compiled template
+    
+    Args:
+        template_name (str): Template in templates/email
+        contexts (list): dict of template variables for each email
+    
+    Returns:
+        list: Rendered HTML bodies, in the same order as contexts
     """
-    return send_email(email, subject, message)
+    template = email_templates.get_template(template_name)
+    return [template.render(**context) for context in contexts]
+
+def render_grievance_status_update(grievance_id, new_status, title):
+    """Get the (subject, message) of the email about a grievance status update"""
+    subject = f"Grievance Status Update - {title}"
+    message = render_email('status_update.html', grievance_id=grievance_id, new_status=new_status, title=title)
+    return subject, message
 
 def send_new_grievance_notification(email, grievance_id, title=None):
     """Send email notification about a new grievance submission"""
@@ -87,28 +315,5 @@ def send_new_grievance_notification(email, grievance_id, title=None):
         subject = f"Grievance Submitted Successfully - {title}"
     else:
         subject = "Grievance Submitted Successfully"
-    message = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px;">
-            <div style="text-align: center; margin-bottom: 20px;">
-                <img src="https://www.dut.ac.za/wp-content/uploads/2022/03/DUT-NEW-LOGO.png" alt="DUT Logo" style="max-width: 150px;">
-            </div>
-            <h2 style="color: #004F9F;">Grievance Submitted Successfully</h2>
-            <p>Dear Student,</p>
-            <p>Your grievance has been submitted successfully.</p>
-            <p><strong>Grievance ID:</strong> #{grievance_id}<br>
-            {f'<strong>Title:</strong> {title}<br>' if title else ''}
-            <strong>Status:</strong> Pending</p>
-            <p>Your grievance will be reviewed by the administration shortly. You will receive notifications as its status changes.</p>
-            <div style="margin-top: 30px; text-align: center;">
-                <a href="#" style="background-color: #004F9F; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; font-weight: bold;">View Grievance</a>
-            </div>
-            <p style="margin-top: 30px; font-size: 0.9em; color: #666; border-top: 1px solid #ddd; padding-top: 15px;">
-                This is an automated message from the DUT Student Grievance Management System. Please do not reply to this email.
-            </p>
-        </div>
-    </body>
-    </html>
-    """
-    return send_email(email, subject, message) 
\ No newline at end of file
+    message = render_email('new_grievance.html', grievance_id=grievance_id, title=title)
+    return queue_email(email, subject, message)
@@ -0,0 +1,167 @@
+"""
+Pre-aggregated grievance counts.
+
+The grievance_stats table holds the number of grievances for each
+(department, status, month) combination. db_utils adjusts it in the same
+transaction as every change it counts: create_grievance adds one,
+update_grievance_status moves one between statuses and delete_department
+removes the department's rows. The dashboard and report counters read these
+rows instead of counting the grievances table, so their cost depends on the
+number of departments and statuses rather than on the number of grievances.
+
+Rows written outside db_utils (for example by editing the database by hand)
+are not counted; `flask stats check` reports any drift and `flask stats
+rebuild` recounts the table from the grievances.
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, update, delete, insert
+from .models import db, Grievance, GrievanceStat, Department
+
+def month_key(created_at):
+    """Get the grievance_stats month for a submission time"""
+    return created_at.strftime('%Y-%m')
+
+def month_expression(column):
+    """SQL expression giving the YYYY-MM month of a datetime column"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+def adjust_stat(department_id, status, month, delta):
+    """Add delta to one grievance_stats counter, creating it if needed. The caller commits."""
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(GrievanceStat).values(
+            department_id=department_id, status=status, month=month, count=delta)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['department_id', 'status', 'month'],
+            set_={'count': GrievanceStat.count + statement.excluded.count}))
+        return
+    updated = db.session.execute(
+        update(GrievanceStat)
+        .where(GrievanceStat.department_id == department_id,
+               GrievanceStat.status == status,
+               GrievanceStat.month == month)
+        .values(count=GrievanceStat.count + delta)
+    ).rowcount
+    if not updated:
+        db.session.execute(insert(GrievanceStat).values(
+            department_id=department_id, status=status, month=month, count=delta))
+
+def record_grievance_created(department_id, status, created_at):
+    """Count a new grievance. The caller commits."""
+    adjust_stat(department_id, status, month_key(created_at), 1)
+
+def record_status_change(department_id, old_status, new_status, created_at):
+    """Move a grievance from one status counter to another. The caller commits."""
+    if old_status == new_status:
+        return
+    month = month_key(created_at)
+    adjust_stat(department_id, old_status, month, -1)
+    adjust_stat(department_id, new_status, month, 1)
+
+def remove_department_stats(department_id):
+    """Drop the counters of a department whose grievances are being deleted. The caller commits."""
+    db.session.execute(delete(GrievanceStat).where(GrievanceStat.department_id == department_id))
+
+def count_grievance_groups():
+    """Count the grievances table directly, grouped like grievance_stats"""
+    month = month_expression(Grievance.created_at)
+    rows = (
+        db.session.query(Grievance.department_id, Grievance.status, month, func.count(Grievance.id))
+        .group_by(Grievance.department_id, Grievance.status, month)
+        .all()
+    )
+    return {(department_id, status, month): count for department_id, status, month, count in rows}
+
+def rebuild_stats():
+    """Recount grievance_stats from the grievances table. Returns the number of counters written."""
+    try:
+        counts = count_grievance_groups()
+        db.session.execute(delete(GrievanceStat))
+        if counts:
+            db.session.execute(insert(GrievanceStat), [
+                {'department_id': department_id, 'status': status, 'month': month, 'count': count}
+                for (department_id, status, month), count in counts.items()
+            ])
+        db.session.commit()
+        return len(counts)
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+def check_stats():
+    """
+    Compare grievance_stats with a fresh count of the grievances table.
+
+    Returns a list of (department_id, status, month, stored count, actual count)
+    for every counter that differs.
+    """
+    actual = count_grievance_groups()
+    stored = {(s.department_id, s.status, s.month): s.count for s in GrievanceStat.query.all()}
+    differences = []
+    for key in sorted(set(actual) | set(stored), key=lambda k: tuple(str(part) for part in k)):
+        if actual.get(key, 0) != stored.get(key, 0):
+            differences.append((*key, stored.get(key, 0), actual.get(key, 0)))
+    return differences
+
+def get_stats_total():
+    """Get the total number of grievances from grievance_stats"""
+    return db.session.query(func.coalesce(func.sum(GrievanceStat.count), 0)).scalar()
+
+def get_stats_by_status():
+    """Get grievance counts by status from grievance_stats"""
+    rows = (
+        db.session.query(GrievanceStat.status, func.sum(GrievanceStat.count))
+        .group_by(GrievanceStat.status)
+        .all()
+    )
+    return {status: count for status, count in rows if count}
+
+def get_stats_by_department():
+    """Get grievance counts by department name from grievance_stats"""
+    rows = (
+        db.session.query(Department.name, func.sum(GrievanceStat.count))
+        .select_from(GrievanceStat)
+        .outerjoin(Department, GrievanceStat.department_id == Department.id)
+        .group_by(GrievanceStat.department_id, Department.name)
+        .all()
+    )
+    counts = {}
+    for name, count in rows:
+        if count:
+            name = name or 'Unknown'
+            counts[name] = counts.get(name, 0) + count
+    return counts
+
+def init_grievance_stats(app):
+    """Add the `flask stats` commands"""
+    app.cli.add_command(stats_group)
+
+@click.group('stats')
+def stats_group():
+    """Maintain the grievance_stats counters."""
+
+@stats_group.command('rebuild')
+@with_appcontext
+def rebuild_command():
+    """Recount grievance_stats from the grievances table."""
+    written = rebuild_stats()
+    click.echo(f"Rebuilt grievance_stats with {written} counter(s)")
+
+@stats_group.command('check')
+@with_appcontext
+def check_command():
+    """Report counters that do not match the grievances table."""
+    differences = check_stats()
+    if not differences:
+        click.echo("grievance_stats matches the grievances table")
+        return
+    for department_id, status, month, stored, actual in differences:
+        click.echo(f"department {department_id}, {status}, {month}: stored {stored}, actual {actual}")
+    raise click.ClickException(f"{len(differences)} counter(s) differ; run `flask stats rebuild` to fix them")
@@ -0,0 +1,97 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Request latency and database time per blueprint, email send latency and
+failures, attachment upload size and time, and submitted grievances are kept
+in prometheus_client counters and histograms. Recording a value costs a few
+microseconds and no I/O on the request path.
+
+Under gunicorn each worker is a separate process. gunicorn.conf.py points
+PROMETHEUS_MULTIPROC_DIR at a shared folder, every process writes its values
+there, and /metrics adds them up across workers, so any worker can answer a
+scrape. Without the variable (the development server, CLI commands) the
+values of the current process are served.
+
+Set METRICS_TOKEN to require "Authorization: Bearer <token>" on /metrics.
+"""
+import hmac
+import os
+import time
+from flask import g, request, current_app, Response, abort
+from prometheus_client import (
+    Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+REQUEST_LATENCY = Histogram(
+    'portal_request_duration_seconds', 'Time to handle a request', ['blueprint', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+REQUESTS = Counter(
+    'portal_requests', 'Requests handled', ['blueprint', 'method', 'status'])
+REQUEST_DB_TIME = Histogram(
+    'portal_request_db_seconds', 'Database time spent handling a request', ['blueprint'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+EMAIL_LATENCY = Histogram(
+    'portal_email_send_seconds', 'Time to send one email', ['transport'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+EMAIL_FAILURES = Counter(
+    'portal_email_failures', 'Emails that could not be sent', ['transport'])
+UPLOAD_BYTES = Histogram(
+    'portal_upload_bytes', 'Size of uploaded attachments',
+    buckets=(10 * 1024, 100 * 1024, 512 * 1024, 1024 ** 2, 2 * 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2, 25 * 1024 ** 2))
+UPLOAD_DURATION = Histogram(
+    'portal_upload_duration_seconds', 'Time to receive and hash an uploaded attachment',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+GRIEVANCES_CREATED = Counter(
+    'portal_grievances_created', 'Grievances submitted')
+
+def record_email_sent(transport, seconds):
+    EMAIL_LATENCY.labels(transport).observe(seconds)
+
+def record_email_failed(transport):
+    EMAIL_FAILURES.labels(transport).inc()
+
+def record_upload(size, seconds):
+    UPLOAD_BYTES.observe(size)
+    UPLOAD_DURATION.observe(seconds)
+
+def record_grievance_submitted():
+    GRIEVANCES_CREATED.inc()
+
+def get_registry():
+    """Get the registry to serve: every worker's values in multiprocess mode, else this process's"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def metrics_view():
+    """Serve the metrics in the Prometheus text format"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
+
+def init_metrics(app):
+    """Record request metrics and add the /metrics endpoint"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None or request.endpoint == 'metrics':
+            return response
+        blueprint = request.blueprint or 'app'
+        REQUEST_LATENCY.labels(blueprint, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(blueprint, request.method, str(response.status_code)).inc()
+        # Collected by sql_instrumentation, whose after_request runs after this one
+        queries = g.get('sql_queries')
+        if queries is not None:
+            REQUEST_DB_TIME.labels(blueprint).observe(queries.seconds)
+        return response
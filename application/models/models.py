@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from application  import db
+from .passwords import hash_password, verify_password
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -17,10 +17,10 @@ class User(UserMixin, db.Model):
     grievances = db.relationship('Grievance', backref='student', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
 class Department(db.Model):
     __tablename__ = 'departments'
@@ -43,6 +43,8 @@ class Grievance(db.Model):
     status = db.Column(db.String(20), nullable=False, default='pending')
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set with every status update, cleared once analytics.py has recomputed the grievance's metrics
+    metrics_stale = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     
     # Foreign Keys
     student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -50,7 +52,18 @@ class Grievance(db.Model):
     
     # Relationships
     attachments = db.relationship('Attachment', backref='grievance', lazy=True)
-    status_updates = db.relationship('StatusUpdate', backref='grievance', lazy=True, cascade="all, delete-orphan")
+    status_updates = db.relationship('StatusUpdate', backref='grievance', lazy=True, cascade="all, delete-orphan",
+                                     order_by='(StatusUpdate.created_at, StatusUpdate.id)')
+    
+    # Indexes matching the list, filter and pagination queries in db_utils
+    __table_args__ = (
+        db.Index('ix_grievances_created_at_id', 'created_at', 'id'),
+        db.Index('ix_grievances_status_created_at', 'status', 'created_at', 'id'),
+        db.Index('ix_grievances_department_created_at', 'department_id', 'created_at', 'id'),
+        db.Index('ix_grievances_department_status_created_at', 'department_id', 'status', 'created_at'),
+        db.Index('ix_grievances_student_created_at', 'student_id', 'created_at'),
+        db.Index('ix_grievances_metrics_stale', 'metrics_stale'),
+    )
 
 class Attachment(db.Model):
     __tablename__ = 'attachments'
@@ -58,10 +71,25 @@ class Attachment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(512), nullable=False)
+    file_size = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64))
     uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
-    # Foreign Key
-    grievance_id = db.Column(db.Integer, db.ForeignKey('grievances.id'), nullable=False)
+    # Foreign Keys
+    grievance_id = db.Column(db.Integer, db.ForeignKey('grievances.id'), nullable=False, index=True)
+    blob_id = db.Column(db.Integer, db.ForeignKey('blobs.id'), index=True)
+
+class Blob(db.Model):
+    __tablename__ = 'blobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Relationships
+    attachments = db.relationship('Attachment', backref='blob', lazy=True)
 
 class StatusUpdate(db.Model):
     __tablename__ = 'status_updates'
@@ -72,4 +100,62 @@ class StatusUpdate(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Foreign Key
-    grievance_id = db.Column(db.Integer, db.ForeignKey('grievances.id'), nullable=False) 
\ No newline at end of file
+    grievance_id = db.Column(db.Integer, db.ForeignKey('grievances.id'), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_status_updates_grievance_created_at', 'grievance_id', 'created_at'),
+    )
+
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    from_email = db.Column(db.String(120))
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+class GrievanceStat(db.Model):
+    """Number of grievances per department, status and month of submission, kept up to date by db_utils"""
+    __tablename__ = 'grievance_stats'
+    
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # YYYY-MM
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class GrievanceMetric(db.Model):
+    """Response and resolution times of one grievance, derived from its status updates by analytics.py"""
+    __tablename__ = 'grievance_metrics'
+    
+    grievance_id = db.Column(db.Integer, db.ForeignKey('grievances.id'), primary_key=True)
+    department_id = db.Column(db.Integer, nullable=False)
+    query_category = db.Column(db.String(100), nullable=False)
+    submitted_at = db.Column(db.DateTime, nullable=False)
+    first_response_seconds = db.Column(db.Float)
+    resolution_seconds = db.Column(db.Float)
+    last_update_id = db.Column(db.Integer, nullable=False)
+    
+    status_durations = db.relationship('GrievanceStatusDuration', lazy=True, cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        db.Index('ix_grievance_metrics_department_submitted_at', 'department_id', 'submitted_at'),
+    )
+
+class GrievanceStatusDuration(db.Model):
+    """Total time one grievance spent in a status before moving to the next"""
+    __tablename__ = 'grievance_status_durations'
+    
+    grievance_id = db.Column(db.Integer, db.ForeignKey('grievance_metrics.grievance_id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    seconds = db.Column(db.Float, nullable=False)
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Password hashing with configurable cost.
+
+PASSWORD_HASH_METHOD takes any werkzeug method string, for example
+'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'. Hashes stored with other
+parameters still verify, and needs_rehash() tells auth.login to upgrade them
+after a successful login.
+
+Passwords are verified on the request thread by default. Setting
+PASSWORD_HASH_WORKERS runs verification in a pool of that many threads
+instead, which caps how many hashes a worker computes at once (each scrypt
+hash holds its own block of memory). hashlib's scrypt and pbkdf2 release the
+GIL while hashing, so with GUNICORN_THREADS above 1 the worker's other
+requests keep running meanwhile; with a single thread the pool gains nothing.
+Use `flask password-benchmark` to pick a cost that suits the host.
+"""
+from functools import lru_cache
+import atexit
+import os
+import threading
+import time
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_hash_settings():
+    """Get the (method, salt length) configured for new hashes"""
+    if not has_app_context():
+        return DEFAULT_METHOD, DEFAULT_SALT_LENGTH
+    return (current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+            current_app.config.get('PASSWORD_HASH_SALT_LENGTH', DEFAULT_SALT_LENGTH))
+
+@lru_cache(maxsize=None)
+def get_method_prefix(method):
+    """Get the method with werkzeug's defaults filled in, as it appears in stored hashes"""
+    return generate_password_hash('', method, salt_length=1).split('$', 1)[0]
+
+def hash_password(password):
+    """Hash a password with the configured method and salt length"""
+    method, salt_length = get_hash_settings()
+    return generate_password_hash(password, method, salt_length=salt_length)
+
+def needs_rehash(password_hash):
+    """Check whether a stored hash was made with other parameters than the configured ones"""
+    method, salt_length = get_hash_settings()
+    try:
+        stored_method, salt, _ = password_hash.split('$', 2)
+    except ValueError:
+        return True
+    return stored_method != get_method_prefix(method) or len(salt) != salt_length
+
+def get_verify_pool():
+    """Get the thread pool for this process, or None if verification runs inline"""
+    global _pool, _pool_pid
+    workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0) if has_app_context() else 0
+    if not workers:
+        return None
+    # The threads of a pool inherited from the parent of a forked worker do not exist here
+    if _pool is None or _pool_pid != os.getpid():
+        from concurrent.futures import ThreadPoolExecutor
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-verify')
+                _pool_pid = os.getpid()
+    return _pool
+
+def shutdown_verify_pool():
+    """Stop the pool threads started by this process"""
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown()
+    _pool = None
+
+atexit.register(shutdown_verify_pool)
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash, in the verify pool when one is configured"""
+    pool = get_verify_pool()
+    if pool is None:
+        return check_password_hash(password_hash, password)
+    return pool.submit(check_password_hash, password_hash, password).result()
+
+def init_password_hashing(app):
+    """Add the `flask password-benchmark` command, checking the hash method unless starting fast"""
+    if not app.config.get('FAST_STARTUP'):
+        get_method_prefix(app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD))
+    app.cli.add_command(password_benchmark_command)
+
+def _count_hashes(method, seconds):
+    """Hash for the given number of seconds and return the number of hashes made"""
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        generate_password_hash('benchmark-password', method)
+        count += 1
+    return count
+
+@click.command('password-benchmark')
+@click.option('--method', 'methods', multiple=True,
+              help='Hash method to measure, e.g. pbkdf2:sha256:600000. Repeat to compare several. '
+                   'Defaults to PASSWORD_HASH_METHOD.')
+@click.option('--seconds', default=3.0, show_default=True, help='Time to spend on each measurement.')
+@click.option('--threads', default=os.cpu_count() or 1, show_default=True,
+              help='Threads to hash with at the same time for the all-cores measurement.')
+@with_appcontext
+def password_benchmark_command(methods, seconds, threads):
+    """Measure password hashes per second on this host."""
+    from concurrent.futures import ThreadPoolExecutor
+    methods = methods or (current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),)
+    click.echo(f"{'method':<28} {'ms/hash':>9} {'hashes/s/core':>14} {f'hashes/s x{threads}':>16}")
+    for method in methods:
+        method = get_method_prefix(method)
+        single = _count_hashes(method, seconds) / seconds
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            counts = pool.map(_count_hashes, [method] * threads, [seconds] * threads)
+            combined = sum(counts) / seconds
+        click.echo(f"{method:<28} {1000 / single:>9.1f} {single:>14.1f} {combined:>16.1f}")
@@ -0,0 +1,189 @@
+"""
+Reporting queries for the admin reports page.
+
+Grievances are counted and grouped in the database, filtered by a submission
+date range, department and status, and bucketed by day, week or month.
+Bucket labels are 'YYYY-MM-DD' for days, the Monday starting each week as
+'YYYY-MM-DD', and 'YYYY-MM' for months.
+
+When a report only needs whole months, it is answered from the grievance_stats
+rollup, whose size does not grow with the number of grievances. Day and week
+buckets, and ranges that start or end part way through a month, count the
+grievances table through its created_at indexes.
+"""
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from .models import db, Grievance, GrievanceStat, Department
+
+BUCKETS = ('day', 'week', 'month')
+MAX_BUCKETS = 1000  # points on the trend chart; about 2.7 years of days or 19 years of weeks
+
+# start and end are datetimes (end exclusive), or None for an open range
+ReportFilters = namedtuple('ReportFilters', ['start', 'end', 'department_id', 'status', 'bucket'])
+
+def parse_report_filters(args):
+    """
+    Build ReportFilters from request arguments: from and to (YYYY-MM-DD, both
+    inclusive), department (id), status and bucket.
+
+    Raises ValueError if a date, the department or the bucket is invalid.
+    """
+    start = end = None
+    if args.get('from'):
+        start = datetime.strptime(args['from'], '%Y-%m-%d')
+    if args.get('to'):
+        try:
+            end = datetime.strptime(args['to'], '%Y-%m-%d') + timedelta(days=1)
+        except OverflowError:
+            raise ValueError("The end date is out of range")
+    if start and end and start >= end:
+        raise ValueError("The start date must be on or before the end date")
+    department_id = int(args['department']) if args.get('department') else None
+    bucket = args.get('bucket') or 'month'
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'")
+    return ReportFilters(start, end, department_id, args.get('status') or None, bucket)
+
+def count_buckets(first, last, bucket):
+    """Count the buckets from the one containing first to the one containing last, without listing them"""
+    if bucket == 'month':
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    if bucket == 'week':
+        return ((last - timedelta(days=last.weekday())) - (first - timedelta(days=first.weekday()))).days // 7 + 1
+    return (last - first).days + 1
+
+def check_bucket_count(filters):
+    """
+    Raise ValueError if the trend chart for the filters would have more than
+    MAX_BUCKETS buckets. A range without a start begins at the first matching
+    grievance, found with one indexed MIN(created_at) lookup.
+    """
+    first = filters.start
+    if not first:
+        first = _filter_grievances(db.session.query(func.min(Grievance.created_at)), filters).scalar()
+        if first is None:
+            return
+    first = first.date()
+    last = min((filters.end - timedelta(days=1)).date() if filters.end else date.max, datetime.utcnow().date())
+    if count_buckets(first, max(last, first), filters.bucket) > MAX_BUCKETS:
+        raise ValueError(f"The range is too long to show by {filters.bucket} (at most {MAX_BUCKETS} points); "
+                         "choose a shorter range or a larger bucket")
+
+def bucket_expression(column, bucket):
+    """SQL expression giving the bucket label of a datetime column"""
+    if db.engine.dialect.name == 'postgresql':
+        label_format = 'YYYY-MM' if bucket == 'month' else 'YYYY-MM-DD'
+        return func.to_char(func.date_trunc(bucket, column), label_format)
+    if bucket == 'day':
+        return func.strftime('%Y-%m-%d', column)
+    if bucket == 'week':
+        # Move forward to Sunday, then back to the Monday that starts the week
+        return func.date(column, 'weekday 0', '-6 days')
+    return func.strftime('%Y-%m', column)
+
+def uses_rollup(filters, bucket=None):
+    """Check whether grievance_stats can answer a report: whole months only"""
+    bucket = bucket or filters.bucket
+    whole_month = lambda moment: moment is None or (moment.day == 1 and moment.time() == datetime.min.time())
+    return bucket == 'month' and whole_month(filters.start) and whole_month(filters.end)
+
+def _filter_rollup(query, filters):
+    """Apply report filters to a grievance_stats query"""
+    if filters.start:
+        query = query.filter(GrievanceStat.month >= filters.start.strftime('%Y-%m'))
+    if filters.end:
+        query = query.filter(GrievanceStat.month < filters.end.strftime('%Y-%m'))
+    if filters.department_id:
+        query = query.filter(GrievanceStat.department_id == filters.department_id)
+    if filters.status:
+        query = query.filter(GrievanceStat.status == filters.status)
+    return query
+
+def _filter_grievances(query, filters):
+    """Apply report filters to a grievances query"""
+    if filters.start:
+        query = query.filter(Grievance.created_at >= filters.start)
+    if filters.end:
+        query = query.filter(Grievance.created_at < filters.end)
+    if filters.department_id:
+        query = query.filter(Grievance.department_id == filters.department_id)
+    if filters.status:
+        query = query.filter(Grievance.status == filters.status)
+    return query
+
+def get_trend_counts(filters):
+    """
+    Get grievance counts per bucket, oldest first, including empty buckets
+    inside the range. Buckets after today are left out, as no grievance can
+    be in them.
+    """
+    if uses_rollup(filters):
+        query = db.session.query(GrievanceStat.month, func.sum(GrievanceStat.count))
+        rows = _filter_rollup(query, filters).group_by(GrievanceStat.month).all()
+    else:
+        label = bucket_expression(Grievance.created_at, filters.bucket)
+        query = db.session.query(label, func.count(Grievance.id))
+        rows = _filter_grievances(query, filters).group_by(label).all()
+    counts = {label: count for label, count in rows if count}
+    if not counts and not (filters.start and filters.end):
+        return {}
+    first = filters.start.date() if filters.start else parse_bucket_label(min(counts))
+    last = (filters.end - timedelta(days=1)).date() if filters.end else parse_bucket_label(max(counts))
+    last = max(min(last, datetime.utcnow().date()), parse_bucket_label(max(counts)) if counts else first)
+    return {label: counts.get(label, 0) for label in bucket_labels(first, last, filters.bucket)}
+
+def get_status_breakdown(filters):
+    """Get grievance counts by status for the report filters"""
+    if uses_rollup(filters, 'month'):
+        query = db.session.query(GrievanceStat.status, func.sum(GrievanceStat.count))
+        rows = _filter_rollup(query, filters).group_by(GrievanceStat.status).all()
+    else:
+        query = db.session.query(Grievance.status, func.count(Grievance.id))
+        rows = _filter_grievances(query, filters).group_by(Grievance.status).all()
+    return {status: count for status, count in rows if count}
+
+def get_department_breakdown(filters):
+    """Get grievance counts by department name for the report filters"""
+    if uses_rollup(filters, 'month'):
+        query = (
+            db.session.query(Department.name, func.sum(GrievanceStat.count))
+            .select_from(GrievanceStat)
+            .outerjoin(Department, GrievanceStat.department_id == Department.id)
+        )
+        rows = _filter_rollup(query, filters).group_by(GrievanceStat.department_id, Department.name).all()
+    else:
+        query = (
+            db.session.query(Department.name, func.count(Grievance.id))
+            .select_from(Grievance)
+            .outerjoin(Department, Grievance.department_id == Department.id)
+        )
+        rows = _filter_grievances(query, filters).group_by(Grievance.department_id, Department.name).all()
+    counts = {}
+    for name, count in rows:
+        if count:
+            name = name or 'Unknown'
+            counts[name] = counts.get(name, 0) + count
+    return counts
+
+def parse_bucket_label(label):
+    """Get the first day covered by a bucket label"""
+    if len(label) == 7:
+        return datetime.strptime(label, '%Y-%m').date()
+    return datetime.strptime(label, '%Y-%m-%d').date()
+
+def bucket_labels(first, last, bucket):
+    """List the labels of every bucket from the one containing first to the one containing last"""
+    labels = []
+    if bucket == 'month':
+        year, month = first.year, first.month
+        while (year, month) <= (last.year, last.month):
+            labels.append(f'{year:04d}-{month:02d}')
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return labels
+    step = timedelta(days=7 if bucket == 'week' else 1)
+    current = first - timedelta(days=first.weekday()) if bucket == 'week' else first
+    while current <= last:
+        labels.append(current.isoformat())
+        current += step
+    return labels
@@ -0,0 +1,28 @@
+"""
+Creating the schema for a new database.
+
+The migrations start from an existing schema, so a new database (for example
+a fresh PostgreSQL server) is set up with `flask init-db`. It creates every
+table from the models and stamps the database with the latest migration, after
+which `flask db upgrade` applies new migrations as usual.
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+from .models import db
+
+def init_schema(app):
+    """Add the `flask init-db` command"""
+    app.cli.add_command(init_db_command)
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create all tables in a new database and mark it as fully migrated."""
+    from flask_migrate import stamp
+    existing = inspect(db.engine).get_table_names()
+    if 'alembic_version' in existing:
+        raise click.ClickException("The database is already managed by migrations; run `flask db upgrade` instead.")
+    db.create_all()
+    stamp()
+    click.echo(f"Created the schema on {db.engine.url.render_as_string(hide_password=True)}")
@@ -0,0 +1,207 @@
+"""
+Bulk seeding of large, realistic datasets for performance tests.
+
+seed_dataset() writes students, grievances and their status histories with
+batched INSERT statements instead of create_user/create_grievance, which
+commit and hash a password per row. Every generated user shares one password
+hash, made once. The grievance_stats counters and the response-time metrics
+are rebuilt at the end, as db_utils would have kept them.
+
+The data depends only on the seed, the scale and the end date: the same
+arguments always produce the same users, grievances, statuses and times.
+Generated students have emails like load<seed>.<n>@dut4life.ac.za and the
+dataset's admin is load<seed>.admin@dut.ac.za, so datasets with different
+seeds can be added to the same database.
+"""
+from datetime import datetime, timedelta
+import random
+import time
+from sqlalchemy import insert, func
+from .models import db, User, Department, Grievance, StatusUpdate
+from .passwords import hash_password
+from .grievance_stats import rebuild_stats
+from .analytics import refresh_metrics
+
+SEED_DEPARTMENTS = [
+    'Academic Administration',
+    'Admissions Office',
+    'Finance Department',
+    'Student Housing',
+    'Financial Aid',
+    'Faculty of Accounting and Informatics',
+    'Faculty of Applied Sciences',
+    'Faculty of Arts and Design',
+    'Faculty of Engineering and the Built Environment',
+    'Faculty of Health Sciences',
+    'Faculty of Management Sciences',
+]
+
+# Categories offered on the new grievance form, with example titles and how often each is chosen
+SEED_CATEGORIES = {
+    'Module/Subject Queries': (['Course material not available', 'Lecturer attendance issues', 'Course schedule conflict'], 25),
+    'Assessment & Exam-Related': (['Missing exam results', 'Exam venue concerns', 'Supplementary exam request'], 25),
+    'Academic Records': (['Incorrect student details', 'Course enrollment error', 'Transcript not issued'], 15),
+    'Administrative Support': (['Registration fee issue', 'Payment receipt not received', 'Accommodation application delay'], 15),
+    'Technical or System Access': (['Student portal login issues', 'Wi-Fi connectivity problems', 'Library access card problem'], 10),
+    'Advising & Support': (['Scholarship application status', 'Financial aid processing delay', 'Career guidance request'], 5),
+    'Other': (['Parking access problems', 'Cafeteria service complaint', 'Noise complaints in residence'], 5),
+}
+
+FIRST_NAMES = ['Thandiwe', 'Sipho', 'Ayanda', 'Lerato', 'Kabelo', 'Nomvula', 'Zanele', 'Themba', 'Priya', 'Johan',
+               'Naledi', 'Mandla', 'Fatima', 'Lwazi', 'Anele', 'Bongani', 'Refilwe', 'Sarah', 'David', 'Khanyisile']
+LAST_NAMES = ['Nkabinde', 'Dlamini', 'Naidoo', 'Mokoena', 'Khumalo', 'Botha', 'Ndlovu', 'Pillay', 'Zulu', 'Mthembu',
+              'Van der Merwe', 'Maharaj', 'Ngcobo', 'Mahlangu', 'Smith', 'Cele', 'Govender', 'Shabalala', 'Mkhize', 'Molefe']
+
+# Status workflow: (next status, probability, mean hours spent before moving on)
+TRANSITIONS = {
+    'pending': [('assigned', 0.55, 30), ('in_progress', 0.25, 20), (None, 0.20, 0)],
+    'assigned': [('in_progress', 0.70, 40), ('under_review', 0.15, 60), (None, 0.15, 0)],
+    'in_progress': [('under_review', 0.45, 70), ('resolved', 0.40, 90), (None, 0.15, 0)],
+    'under_review': [('resolved', 0.75, 80), ('in_progress', 0.10, 50), (None, 0.15, 0)],
+    'resolved': [('closed', 0.60, 120), (None, 0.40, 0)],
+    'closed': [(None, 1.0, 0)],
+}
+
+STATUS_NOTES = {
+    'pending': 'Grievance submitted',
+    'assigned': 'Assigned to the responsible department',
+    'in_progress': 'The department is working on this grievance',
+    'under_review': 'Under review by the department head',
+    'resolved': 'Resolved, please contact the department if anything is outstanding',
+    'closed': 'Closed',
+}
+
+def student_email(seed, number):
+    return f'load{seed}.{number}@dut4life.ac.za'
+
+def admin_email(seed):
+    return f'load{seed}.admin@dut.ac.za'
+
+def ensure_departments():
+    """Create any missing seed departments and return the ids of all departments"""
+    existing = {name for name, in db.session.query(Department.name)}
+    missing = [{'name': name, 'description': f'{name} (seeded)', 'created_at': datetime.utcnow()}
+               for name in SEED_DEPARTMENTS if name not in existing]
+    if missing:
+        db.session.execute(insert(Department), missing)
+        db.session.commit()
+    return [department_id for department_id, in db.session.query(Department.id).order_by(Department.id)]
+
+def insert_returning_ids(model, rows):
+    """Insert rows in one batched statement and return their ids in the same order"""
+    result = db.session.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+    return [row_id for row_id, in result]
+
+def generate_history(rng, submitted_at, until):
+    """Generate the (status, time) history of one grievance, starting with its submission"""
+    history = [('pending', submitted_at)]
+    status, moment = 'pending', submitted_at
+    while True:
+        roll = rng.random()
+        for next_status, probability, mean_hours in TRANSITIONS[status]:
+            roll -= probability
+            if roll < 0:
+                break
+        if next_status is None:
+            return history
+        moment = moment + timedelta(hours=rng.expovariate(1 / mean_hours))
+        if moment >= until:
+            return history
+        status = next_status
+        history.append((status, moment))
+
+def seed_dataset(students, grievances, seed=1, days=365, until=None, password='LoadTest@123456',
+                 batch_size=5000, log=print):
+    """
+    Add a generated dataset of students and grievances.
+
+    Grievances are submitted at random times over the `days` before `until`
+    (default: today at midnight) by random students, and move through the
+    status workflow with random delays. Returns a dict of row counts and the
+    seconds taken.
+
+    Raises ValueError if this seed has already been used on the database.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    until = until or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    window = days * 24 * 60 * 60
+    if User.query.filter_by(email=admin_email(seed)).first():
+        raise ValueError(f"The database already has the dataset for seed {seed}")
+
+    try:
+        department_ids = ensure_departments()
+        categories = list(SEED_CATEGORIES)
+        category_weights = [weight for _, weight in SEED_CATEGORIES.values()]
+
+        # One hash for every generated user, so seeding costs one password hash
+        password_hash = hash_password(password)
+        db.session.execute(insert(User).values(email=admin_email(seed), password_hash=password_hash,
+                                               display_name='Load Test Administrator', role='admin',
+                                               created_at=until - timedelta(seconds=2 * window)))
+        student_ids = []
+        for start in range(0, students, batch_size):
+            rows = []
+            for number in range(start + 1, min(start + batch_size, students) + 1):
+                rows.append({
+                    'email': student_email(seed, number),
+                    'password_hash': password_hash,
+                    'display_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    'role': 'student',
+                    'created_at': until - timedelta(seconds=window + rng.uniform(0, window)),
+                })
+            student_ids.extend(insert_returning_ids(User, rows))
+            db.session.commit()
+        log(f"  {students} students")
+
+        updates_written = 0
+        for start in range(0, grievances, batch_size):
+            rows, histories = [], []
+            for _ in range(min(batch_size, grievances - start)):
+                category = rng.choices(categories, category_weights)[0]
+                submitted_at = until - timedelta(seconds=rng.uniform(0, window))
+                history = generate_history(rng, submitted_at, until)
+                rows.append({
+                    'title': rng.choice(SEED_CATEGORIES[category][0]),
+                    'description': f'Generated grievance about {category.lower()} (seed {seed}).',
+                    'query_category': category,
+                    'status': history[-1][0],
+                    'created_at': submitted_at,
+                    'updated_at': history[-1][1],
+                    'student_id': rng.choice(student_ids),
+                    'department_id': rng.choice(department_ids),
+                })
+                histories.append(history)
+            grievance_ids = insert_returning_ids(Grievance, rows)
+            updates = [
+                {'grievance_id': grievance_id, 'status': status, 'note': STATUS_NOTES[status], 'created_at': moment}
+                for grievance_id, history in zip(grievance_ids, histories)
+                for status, moment in history
+            ]
+            db.session.execute(insert(StatusUpdate), updates)
+            db.session.commit()
+            updates_written += len(updates)
+            log(f"  {start + len(rows)}/{grievances} grievances")
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+    # Bring the rollups up to date with the new rows
+    counters = rebuild_stats()
+    metrics = refresh_metrics(full=True)
+    return {
+        'students': students,
+        'grievances': grievances,
+        'status_updates': updates_written,
+        'stat_counters': counters,
+        'grievance_metrics': metrics,
+        'seconds': time.perf_counter() - started,
+    }
+
+def count_rows():
+    """Count the users, grievances and status updates in the database"""
+    return {
+        'users': db.session.query(func.count(User.id)).scalar(),
+        'grievances': db.session.query(func.count(Grievance.id)).scalar(),
+        'status_updates': db.session.query(func.count(StatusUpdate.id)).scalar(),
+    }
@@ -0,0 +1,124 @@
+"""
+Per-request SQL instrumentation.
+
+Cursor events on the engine time every statement. While a request is being
+handled the statements are collected for it, and when the response is ready:
+
+- a Server-Timing header reports the database time and statement count next
+  to the total time, so browser developer tools show them per page;
+- the per-endpoint totals (requests, statements, database time and the
+  slowest statement seen) are updated, see get_endpoint_stats();
+- statement shapes run more than N_PLUS_ONE_THRESHOLD times in the request
+  are logged as possible N+1 queries, typically a lazy load inside a loop.
+
+Statements slower than SLOW_QUERY_MS are logged whether or not they run in a
+request. Only the types of their parameters are logged, never the values,
+which may be password hashes, emails or grievance text.
+"""
+from collections import Counter
+import logging
+import re
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from .models import db
+
+logger = logging.getLogger(__name__)
+
+_endpoint_stats = {}
+_stats_lock = threading.Lock()
+
+def statement_shape(statement):
+    """Normalise a statement so repeats with other parameters or IN list sizes compare equal"""
+    shape = re.sub(r'\s+', ' ', statement).strip()
+    shape = re.sub(r'%\(\w+\)s|\$\d+|(?<![:\w]):\w+', '?', shape)
+    return re.sub(r'\?(?:\s*,\s*\?)+', '?', shape)
+
+def redact_parameters(parameters):
+    """Describe statement parameters by type only"""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return f'{len(parameters)} parameter sets of {redact_parameters(parameters[0])}'
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+class RequestQueries:
+    """The statements run while handling one request"""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = (0.0, None)
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.slowest[0]:
+            self.slowest = (seconds, statement)
+        self.shapes[statement_shape(statement)] += 1
+
+def record_endpoint(endpoint, queries):
+    """Add one request's statements to the totals of its endpoint"""
+    with _stats_lock:
+        stats = _endpoint_stats.setdefault(endpoint, {
+            'requests': 0, 'queries': 0, 'db_seconds': 0.0, 'max_queries': 0,
+            'slowest_seconds': 0.0, 'slowest_statement': None
+        })
+        stats['requests'] += 1
+        stats['queries'] += queries.count
+        stats['db_seconds'] += queries.seconds
+        stats['max_queries'] = max(stats['max_queries'], queries.count)
+        if queries.slowest[0] > stats['slowest_seconds']:
+            stats['slowest_seconds'], stats['slowest_statement'] = queries.slowest
+
+def get_endpoint_stats():
+    """Get a copy of the per-endpoint totals of this process"""
+    with _stats_lock:
+        return {endpoint: dict(stats) for endpoint, stats in _endpoint_stats.items()}
+
+def init_sql_instrumentation(app):
+    """Time the statements of each request and add the Server-Timing header"""
+    if not app.config.get('SQL_INSTRUMENTATION', True):
+        return
+    slow_seconds = app.config.get('SLOW_QUERY_MS', 200) / 1000
+    repeat_threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 5)
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['query_started'].pop()
+        if seconds >= slow_seconds:
+            endpoint = request.endpoint if has_request_context() else None
+            logger.warning("Slow query (%.1f ms) on %s: %s parameters=%s", seconds * 1000, endpoint or 'no request',
+                           re.sub(r'\s+', ' ', statement), redact_parameters(parameters))
+        if has_request_context() and 'sql_queries' in g:
+            g.sql_queries.record(statement, seconds)
+
+    @app.before_request
+    def start_request_queries():
+        g.sql_queries = RequestQueries()
+
+    @app.after_request
+    def report_request_queries(response):
+        queries = g.pop('sql_queries', None)
+        if queries is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        record_endpoint(endpoint, queries)
+        for shape, repeats in queries.shapes.items():
+            if repeats > repeat_threshold:
+                logger.warning("Possible N+1 on %s: %d statements of the form %s", endpoint, repeats, shape)
+        if app.config.get('SERVER_TIMING', True):
+            total_ms = (time.perf_counter() - queries.started) * 1000
+            response.headers.add('Server-Timing', f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries"')
+            response.headers.add('Server-Timing', f'app;dur={total_ms:.1f}')
+        return response
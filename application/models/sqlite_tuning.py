@@ -0,0 +1,66 @@
+"""
+Connection settings for SQLite databases.
+
+With SQLite's default rollback journal a writer has to wait for every open
+read transaction before it commits, and readers wait while it does, so
+grievance saves and dashboard reads queue behind each other and fail with
+"database is locked" once the busy timeout runs out. init_sqlite_tuning() adds
+a connect hook that switches the database to write-ahead logging (WAL), where
+readers and a writer no longer block each other, and sets:
+
+    synchronous   NORMAL is safe with WAL and avoids an fsync on every commit
+    busy_timeout  milliseconds a writer waits for another writer's lock
+    cache_size    page cache per connection (negative values are KiB)
+    mmap_size     bytes of the file read through memory mapping
+
+Set SQLITE_TUNING=false to leave SQLite's defaults in place.
+"""
+import logging
+from sqlalchemy import event
+from .models import db
+
+logger = logging.getLogger(__name__)
+
+def get_sqlite_pragmas(config):
+    """Get the PRAGMA statements to run on each new connection, in order"""
+    return [
+        ('journal_mode', config.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', config.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        ('cache_size', config.get('SQLITE_CACHE_SIZE', -20000)),
+        ('mmap_size', config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    ]
+
+def read_sqlite_pragmas(connection):
+    """Read the current value of each tuned setting from a DBAPI connection"""
+    cursor = connection.cursor()
+    try:
+        return {name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size')}
+    finally:
+        cursor.close()
+
+def init_sqlite_tuning(app):
+    """Apply the SQLite PRAGMAs to every connection the app opens to a SQLite file"""
+    if not app.config.get('SQLITE_TUNING', True):
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+    pragmas = get_sqlite_pragmas(app.config)
+    reported = []
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+        # Report the settings SQLite actually accepted, once per process
+        if not reported:
+            reported.append(True)
+            settings = ', '.join(f"{name}={value}" for name, value in read_sqlite_pragmas(dbapi_connection).items())
+            logger.info("SQLite settings for %s: %s", engine.url.database, settings)
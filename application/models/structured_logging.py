@@ -0,0 +1,167 @@
+"""
+Structured, non-blocking logging.
+
+configure_logging() gives the root logger a single QueueHandler. Logging a
+record only resolves its message and puts it on an in-memory queue; a
+QueueListener thread formats it and writes it to stderr, so a slow terminal,
+pipe or log collector never holds up a request.
+
+Each record is written as one JSON object with the time, level, logger,
+message, any `extra` fields and, inside a request, the request ID. The ID is
+taken from an incoming X-Request-ID header (for example one set by nginx) or
+generated, and is returned in the X-Request-ID response header so a user's
+report can be matched to the log lines. LOG_FORMAT=text writes plain lines
+for reading in a terminal instead.
+
+Email addresses in messages and fields are masked to ***@domain, and fields
+named like passwords or tokens are dropped, before anything is written.
+
+LOG_LEVEL sets the level of every logger and LOG_LEVELS overrides it for
+single loggers, e.g. "werkzeug=WARNING,application.models.email_utils=DEBUG".
+"""
+import atexit
+import copy
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import re
+import sys
+import uuid
+from flask import g, request, has_request_context
+from flask.logging import default_handler
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@((?:[\w-]+\.)+[\w-]+)')
+SECRET_FIELD_PATTERN = re.compile(r'password|secret|token|authorization', re.IGNORECASE)
+
+# Attributes every LogRecord has; anything else was passed with `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'request_id'}
+
+_listener = None
+_exception_formatter = logging.Formatter()
+
+def redact(value):
+    """Mask the email addresses in a string"""
+    return EMAIL_PATTERN.sub(r'***@\1', value)
+
+def redact_field(name, value):
+    """Redact a structured field, hiding secrets entirely"""
+    if SECRET_FIELD_PATTERN.search(name):
+        return '[redacted]'
+    if isinstance(value, str):
+        return redact(value)
+    return value
+
+def parse_levels(spec):
+    """Parse "name=LEVEL,name=LEVEL" into a dict of logger names to levels"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request's ID to records, in the thread that logs them"""
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+class PreparedQueueHandler(QueueHandler):
+    """
+    Queue records with their message and traceback already resolved, leaving
+    the JSON formatting and the writing to the listener thread.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects"""
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': redact(record.getMessage()),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = redact_field(name, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = redact(record.exc_text)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Format records as plain, redacted lines"""
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        if not getattr(record, 'request_id', None):
+            record.request_id = '-'
+        return redact(super().format(record))
+
+def configure_logging(level='INFO', levels=None, log_format='json', stream=None):
+    """
+    Send all logging through a queue to a listener thread writing to stream
+    (default stderr). Calling it again replaces the previous configuration.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(TextFormatter() if log_format == 'text' else JsonFormatter())
+    handler = PreparedQueueHandler(queue.SimpleQueue())
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+def flush_logging():
+    """Write out the queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(flush_logging)
+
+def init_logging(app):
+    """Configure logging from the app config and give every request an ID"""
+    configure_logging(app.config.get('LOG_LEVEL', 'INFO'), parse_levels(app.config.get('LOG_LEVELS')),
+                      app.config.get('LOG_FORMAT', 'json'))
+    # Flask's own stderr handler would write app.logger records a second time
+    app.logger.removeHandler(default_handler)
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def add_request_id_header(response):
+        if 'request_id' in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
@@ -0,0 +1,58 @@
+"""
+Helpers for saving uploaded attachments.
+
+Uploads are copied from the request stream in fixed-size chunks, so memory use
+does not depend on the size of the file. The size and SHA-256 of the file are
+computed in the same pass, so the blob store can file it under its hash
+without reading it again.
+"""
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload goes over its size limit"""
+
+def format_size(num_bytes):
+    """Format a byte count for messages shown to users"""
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.3g}MB"
+    if num_bytes >= 1024:
+        return f"{num_bytes / 1024:.3g}KB"
+    return f"{num_bytes} bytes"
+
+def write_upload_to_temp(stream, directory, max_bytes, chunk_size=CHUNK_SIZE):
+    """
+    Copy an upload stream to a new temporary file in directory, enforcing a
+    size limit as it goes.
+
+    Raises UploadTooLarge as soon as more than max_bytes have been read, after
+    removing the partial file. The caller is responsible for moving or
+    removing the temporary file.
+
+    Returns a tuple of (temporary file path, size in bytes, SHA-256 hex digest).
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File is larger than the {format_size(max_bytes)} limit")
+                digest.update(chunk)
+                temp_file.write(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, size, digest.hexdigest()
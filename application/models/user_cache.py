@@ -0,0 +1,133 @@
+"""
+Cache of the logged-in user for Flask-Login.
+
+load_session_user() is the user loader for every authenticated request. It
+returns a lightweight SessionUser (id, email, role, display_name) from a
+per-process TTL/LRU cache, and only queries the users table on a miss.
+update_user and delete_user invalidate the entry when a user changes.
+
+Each gunicorn worker has its own cache, so a change made through one worker
+can be seen late by the others for up to USER_CACHE_TTL seconds. Setting
+USER_CACHE_REDIS_URL (with the redis package installed) keeps the entries in
+Redis instead, so an invalidation is seen by every worker at once.
+"""
+from collections import OrderedDict
+import logging
+import threading
+import time
+from flask_login import UserMixin
+from .models import db, User
+
+logger = logging.getLogger(__name__)
+
+class SessionUser(UserMixin):
+    """The fields of a user needed to authenticate and authorise a request"""
+
+    def __init__(self, id, email, role, display_name):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.display_name = display_name
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.email, user.role, user.display_name)
+
+    def to_dict(self):
+        return {'id': self.id, 'email': self.email, 'role': self.role, 'display_name': self.display_name}
+
+class LocalUserCache:
+    """Thread-safe in-process cache with a time-to-live and least-recently-used eviction"""
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def set(self, user_id, principal):
+        with self._lock:
+            self._entries[user_id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisUserCache:
+    """Cache shared by all workers, stored as Redis hashes that expire after ttl seconds"""
+
+    def __init__(self, url, ttl=60, prefix='session-user:'):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, user_id):
+        data = self.client.hgetall(f'{self.prefix}{user_id}')
+        if not data:
+            return None
+        return SessionUser(int(data['id']), data['email'], data['role'], data['display_name'])
+
+    def set(self, user_id, principal):
+        key = f'{self.prefix}{user_id}'
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=principal.to_dict())
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def delete(self, user_id):
+        self.client.delete(f'{self.prefix}{user_id}')
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+_cache = LocalUserCache()
+
+def init_user_cache(app):
+    """Configure the user cache from the app config"""
+    global _cache
+    ttl = app.config.get('USER_CACHE_TTL', 60)
+    redis_url = app.config.get('USER_CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            _cache = RedisUserCache(redis_url, ttl=ttl)
+            return
+        except ImportError:
+            logger.warning("USER_CACHE_REDIS_URL is set but the redis package is not installed; using the local user cache")
+    _cache = LocalUserCache(max_size=app.config.get('USER_CACHE_SIZE', 1024), ttl=ttl)
+
+def load_session_user(user_id):
+    """Get the SessionUser for an id, querying the database only on a cache miss"""
+    user_id = int(user_id)
+    principal = _cache.get(user_id)
+    if principal is None:
+        user = db.session.get(User, user_id)
+        if not user:
+            return None
+        principal = SessionUser.from_user(user)
+        _cache.set(user_id, principal)
+    return principal
+
+def invalidate_session_user(user_id):
+    """Drop a user from the cache after it has been changed or deleted"""
+    _cache.delete(int(user_id))
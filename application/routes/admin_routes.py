@@ -1,14 +1,22 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from application.routes.auth_routes import role_required
 from application.models.db_utils import (
-    get_all_grievances, get_grievance_by_id, update_grievance_status,
-    get_department_grievances, get_user_by_id, get_all_departments,
+    get_grievance_by_id, get_grievance_detail, update_grievance_status,
+    get_user_by_id, get_all_departments,
     create_department, update_department, delete_department, get_department_by_id,
     get_all_users, get_users_by_role, update_user, delete_user,
-    get_student_grievances, get_open_grievances, get_resolved_grievances
+    get_student_grievances,
+    count_grievances, get_status_counts, get_department_counts, get_recent_grievances,
+    paginate_grievances, DEFAULT_PAGE_SIZE
 )
-from application.models.email_utils import send_grievance_status_update
+from application.models.reports import (
+    BUCKETS, ReportFilters, parse_report_filters, check_bucket_count,
+    get_trend_counts, get_status_breakdown, get_department_breakdown
+)
+from application.models.analytics import get_sla_summary, get_status_durations, get_status_durations_by_group
+from application.models.exports import parse_export_filters, query_export_rows, generate_csv, export_filename
+from application.models.sql_instrumentation import get_endpoint_stats
 from datetime import datetime, timedelta
 from collections import defaultdict
 import calendar
@@ -25,32 +33,60 @@ STATUS_OPTIONS = {
     'closed': 'Closed'
 }
 
+# Sort options for paginated grievance lists
+SORT_LABELS = {
+    'newest': 'Newest First',
+    'oldest': 'Oldest First'
+}
+
+def get_grievance_page(**filters):
+    """
+    Fetch the page of grievances requested by the 'after', 'before', 'per_page'
+    and 'sort' query arguments. Returns a tuple of (page, pagination) where
+    pagination holds the links used by shared/pagination.html.
+    """
+    options = {
+        'after': request.args.get('after') or None,
+        'before': request.args.get('before') or None,
+        'page_size': request.args.get('per_page', DEFAULT_PAGE_SIZE),
+        'sort': request.args.get('sort', 'newest')
+    }
+    try:
+        page = paginate_grievances(**filters, **options)
+    except ValueError:
+        flash('Invalid page requested. Showing the first page instead.', 'warning')
+        options.update(after=None, before=None)
+        page = paginate_grievances(**filters, **options)
+    
+    # Keep the current filters and view arguments when building links
+    args = {k: v for k, v in request.args.items() if k not in ('after', 'before', 'sort')}
+    args.update(request.view_args or {})
+    args['per_page'] = page.page_size
+    
+    pagination = {
+        'sort': page.sort,
+        'sort_urls': {key: url_for(request.endpoint, sort=key, **args) for key in SORT_LABELS},
+        'sort_labels': SORT_LABELS,
+        'next_url': url_for(request.endpoint, sort=page.sort, after=page.next_cursor, **args) if page.next_cursor else None,
+        'prev_url': url_for(request.endpoint, sort=page.sort, before=page.prev_cursor, **args) if page.prev_cursor else None
+    }
+    return page, pagination
+
 @admin_bp.route('/dashboard')
 @login_required
 @role_required('admin')
 def dashboard():
-    grievances = get_all_grievances()
+    # Only load the rows shown in the "Recent Enquiries" table
+    grievances = get_recent_grievances(10)
     
-    # Count grievances by status and department
+    # Count grievances by status and department from the grievance_stats table
     status_counts = {status: 0 for status in STATUS_OPTIONS.keys()}
-    department_counts = {}
-    
-    for grievance in grievances:
-        status = grievance.status
-        department = grievance.department.name if grievance.department else 'Unknown'
-        
-        if status in status_counts:
-            status_counts[status] += 1
-        else:
-            status_counts[status] = 1
-            
-        if department in department_counts:
-            department_counts[department] += 1
-        else:
-            department_counts[department] = 1
+    status_counts.update(get_status_counts())
+    department_counts = get_department_counts()
     
     return render_template('admin/dashboard.html', 
                           grievances=grievances, 
+                          total_count=count_grievances(),
                           status_counts=status_counts,
                           department_counts=department_counts,
                           status_options=STATUS_OPTIONS)
@@ -59,15 +95,14 @@ def dashboard():
 @login_required
 @role_required('admin')
 def grievance_detail(grievance_id):
-    grievance = get_grievance_by_id(grievance_id)
+    grievance = get_grievance_detail(grievance_id)
     
     if not grievance:
         flash('Grievance not found.', 'danger')
         return redirect(url_for('admin.dashboard'))
     
-    # Get student information
-    student_id = grievance.student_id
-    student = get_user_by_id(student_id) if student_id else None
+    # Student information is loaded together with the grievance
+    student = grievance.student
     
     return render_template('admin/grievance_detail.html', 
                           grievance=grievance, 
@@ -85,16 +120,15 @@ def update_status(grievance_id):
         flash('Invalid status.', 'danger')
         return redirect(url_for('admin.grievance_detail', grievance_id=grievance_id))
     
-    # Update grievance status
-    grievance = update_grievance_status(grievance_id, new_status, note)
+    # Update grievance status; another admin may have changed it at the same time
+    try:
+        # The student's notification email is queued in the same transaction
+        grievance = update_grievance_status(grievance_id, new_status, note, status_label=STATUS_OPTIONS[new_status])
+    except ValueError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('admin.grievance_detail', grievance_id=grievance_id))
     
     if grievance:
-        # Get student's email for notification
-        student = get_user_by_id(grievance.student_id)
-        if student:
-            # Send email notification
-            send_grievance_status_update(student.email, grievance_id, STATUS_OPTIONS[new_status], grievance.title or "")
-        
         flash('Grievance status updated successfully.', 'success')
     else:
         flash('Failed to update grievance status.', 'danger')
@@ -115,10 +149,11 @@ def list_department_grievances():
         flash('Department not found.', 'danger')
         return redirect(url_for('admin.dashboard'))
     
-    grievances = get_department_grievances(department_id)
+    page, pagination = get_grievance_page(department_id=department.id)
     
     return render_template('admin/department_grievances.html', 
-                          grievances=grievances, 
+                          grievances=page.grievances, 
+                          pagination=pagination,
                           department=department,
                           status_options=STATUS_OPTIONS)
 
@@ -126,38 +161,63 @@ def list_department_grievances():
 @login_required
 @role_required('admin')
 def reports():
-    # Get all grievances
-    grievances = get_all_grievances()
+    try:
+        filters = parse_report_filters(request.args)
+        check_bucket_count(filters)
+    except ValueError as e:
+        flash(f'Invalid report filter: {e}', 'warning')
+        filters = ReportFilters(None, None, None, None, 'month')
     
-    # Create reports data
+    # Counts are grouped in the database, from grievance_stats for whole months
     status_counts = {status: 0 for status in STATUS_OPTIONS.keys()}
-    department_counts = defaultdict(int)
-    monthly_counts = defaultdict(int)
-    
-    for grievance in grievances:
-        # Count by status
-        status = grievance.status
-        if status in status_counts:
-            status_counts[status] += 1
-        
-        # Count by department
-        department = grievance.department.name if grievance.department else 'Unknown'
-        department_counts[department] += 1
-        
-        # Count by month (if created_at is available)
-        if grievance.created_at:
-            month_key = grievance.created_at.strftime('%Y-%m')
-            monthly_counts[month_key] += 1
-    
-    # Sort monthly counts chronologically
-    sorted_monthly_counts = dict(sorted(monthly_counts.items()))
+    status_counts.update(get_status_breakdown(filters))
     
+    # Response times are read from the grievance_metrics cache, which the
+    # analytics worker keeps up to date in the background
     return render_template('admin/reports.html', 
                           status_counts=status_counts,
-                          department_counts=dict(department_counts),
-                          monthly_counts=sorted_monthly_counts,
+                          department_counts=get_department_breakdown(filters),
+                          trend_counts=get_trend_counts(filters),
+                          sla_by_department=get_sla_summary(filters, 'department'),
+                          sla_by_category=get_sla_summary(filters, 'category'),
+                          status_durations=get_status_durations(filters),
+                          durations_by_department=get_status_durations_by_group(filters, 'department'),
+                          durations_by_category=get_status_durations_by_group(filters, 'category'),
+                          filters=filters,
+                          buckets=BUCKETS,
+                          departments=get_all_departments(),
                           status_options=STATUS_OPTIONS)
 
+@admin_bp.route('/export/grievances')
+@login_required
+@role_required('admin')
+def export_grievances():
+    """Download the grievances matching the report filters as CSV"""
+    try:
+        filters = parse_export_filters(request.args)
+    except ValueError as e:
+        flash(f'Invalid export filter: {e}', 'warning')
+        return redirect(url_for('admin.reports'))
+    
+    # Rows are streamed from the database while the response is sent
+    return Response(
+        stream_with_context(generate_csv(query_export_rows(filters))),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={export_filename(filters)}'}
+    )
+
+@admin_bp.route('/sql-stats')
+@login_required
+@role_required('admin')
+def sql_stats():
+    """Statement counts and database time per endpoint, for this worker process since it started"""
+    stats = get_endpoint_stats()
+    for endpoint in stats.values():
+        endpoint['avg_queries'] = round(endpoint['queries'] / endpoint['requests'], 2)
+        endpoint['avg_db_ms'] = round(endpoint.pop('db_seconds') * 1000 / endpoint['requests'], 2)
+        endpoint['slowest_ms'] = round(endpoint.pop('slowest_seconds') * 1000, 2)
+    return jsonify(stats)
+
 # Department Management Routes
 @admin_bp.route('/departments')
 @login_required
@@ -245,11 +305,12 @@ def view_department_grievances(dept_id):
         flash('Department not found.', 'danger')
         return redirect(url_for('admin.departments'))
     
-    grievances = get_department_grievances(dept_id)
+    page, pagination = get_grievance_page(department_id=department.id)
     
     return render_template(
         'admin/grievances.html', 
-        grievances=grievances,
+        grievances=page.grievances,
+        pagination=pagination,
         department=department,
         title=f'Grievances for {department.name}',
         status_options=STATUS_OPTIONS
@@ -341,7 +402,7 @@ def reset_password(user_id):
     try:
         user = get_user_by_id(user_id)
         if user:
-            user.set_password(password)
+            update_user(user_id, {'password': password})
             flash('Password reset successfully.', 'success')
             return redirect(url_for('admin.users'))
         else:
@@ -398,11 +459,12 @@ def student_grievances(student_id):
 @role_required('admin')
 def open_grievances():
     """View all open grievances"""
-    grievances = get_open_grievances()
+    page, pagination = get_grievance_page(open_only=True)
     
     return render_template(
         'admin/grievances.html',
-        grievances=grievances,
+        grievances=page.grievances,
+        pagination=pagination,
         title='Open Grievances',
         status_options=STATUS_OPTIONS
     )
@@ -412,11 +474,12 @@ def open_grievances():
 @role_required('admin')
 def resolved_grievances():
     """View all resolved grievances"""
-    grievances = get_resolved_grievances()
+    page, pagination = get_grievance_page(status='resolved')
     
     return render_template(
         'admin/grievances.html',
-        grievances=grievances,
+        grievances=page.grievances,
+        pagination=pagination,
         title='Resolved Grievances',
         status_options=STATUS_OPTIONS
     )
@@ -426,11 +489,12 @@ def resolved_grievances():
 @role_required('admin')
 def all_grievances():
     """View all grievances"""
-    grievances = get_all_grievances()
+    page, pagination = get_grievance_page()
     
     return render_template(
         'admin/grievances.html',
-        grievances=grievances,
+        grievances=page.grievances,
+        pagination=pagination,
         title='All Grievances',
         status_options=STATUS_OPTIONS
     ) 
\ No newline at end of file
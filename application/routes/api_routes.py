@@ -0,0 +1,263 @@
+"""
+Version 1 of the JSON API, used by the mobile app and the department dashboards.
+
+Requests are authenticated with the same session cookie as the web pages.
+Students only see their own grievances; admins see all of them and may change
+their status. Errors are returned as {"error": {"status": ..., "message": ...}}.
+
+Grievance responses carry an ETag and Last-Modified derived from
+Grievance.updated_at, which status changes and added or deleted attachments
+move forward. A poller that sends them back in If-None-Match or
+If-Modified-Since gets a 304 after a single indexed lookup, without the
+grievance, its status updates or its attachments being loaded.
+"""
+from datetime import timezone
+from functools import wraps
+from flask import Blueprint, request, jsonify, url_for, Response
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+from application.models.db_utils import (
+    get_grievance_detail, get_grievance_version, get_grievance_status_updates, update_grievance_status,
+    get_all_departments, count_grievances, get_status_counts, get_department_counts,
+    get_student_status_counts, paginate_grievances, DEFAULT_PAGE_SIZE
+)
+from application.routes.admin_routes import STATUS_OPTIONS
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def api_error(status, message):
+    """Build a JSON error response"""
+    response = jsonify({'error': {'status': status, 'message': message}})
+    response.status_code = status
+    return response
+
+@api_bp.errorhandler(HTTPException)
+def handle_http_error(error):
+    return api_error(error.code, error.description)
+
+@api_bp.app_errorhandler(404)
+@api_bp.app_errorhandler(405)
+def handle_routing_error(error):
+    # URLs that match no API route never reach the blueprint's own handler
+    if request.path.startswith(api_bp.url_prefix + '/'):
+        return api_error(error.code, error.description)
+    return error
+
+def api_login_required(role=None):
+    """Decorator to require a logged-in user, and optionally a role, with JSON errors instead of redirects"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return api_error(401, 'Authentication required.')
+            if role and current_user.role != role:
+                return api_error(403, 'You do not have permission to access this resource.')
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# Serializers read only columns and relationships the query already loaded
+
+def format_time(moment):
+    return moment.isoformat() + 'Z' if moment else None
+
+def serialize_grievance(grievance):
+    """Serialize a grievance loaded with its department"""
+    department = grievance.department
+    return {
+        'id': grievance.id,
+        'title': grievance.title,
+        'query_category': grievance.query_category,
+        'status': grievance.status,
+        'status_label': STATUS_OPTIONS.get(grievance.status, grievance.status),
+        'department': {'id': department.id, 'name': department.name} if department else None,
+        'student_id': grievance.student_id,
+        'created_at': format_time(grievance.created_at),
+        'updated_at': format_time(grievance.updated_at),
+        'url': url_for('api.grievance_detail', grievance_id=grievance.id)
+    }
+
+def serialize_status_update(status_update):
+    return {
+        'id': status_update.id,
+        'status': status_update.status,
+        'status_label': STATUS_OPTIONS.get(status_update.status, status_update.status),
+        'note': status_update.note,
+        'created_at': format_time(status_update.created_at)
+    }
+
+def serialize_grievance_detail(grievance):
+    """Serialize a grievance loaded by get_grievance_detail"""
+    data = serialize_grievance(grievance)
+    student = grievance.student
+    data.update({
+        'description': grievance.description,
+        'student': {'id': student.id, 'display_name': student.display_name, 'email': student.email} if student else None,
+        'status_updates': [serialize_status_update(s) for s in grievance.status_updates],
+        'attachments': [{
+            'id': attachment.id,
+            'filename': attachment.filename,
+            'size': attachment.file_size,
+            'uploaded_at': format_time(attachment.uploaded_at),
+            'url': url_for('main.download_attachment', attachment_id=attachment.id)
+        } for attachment in grievance.attachments]
+    })
+    return data
+
+# Conditional GET support
+
+def grievance_etag(kind, version):
+    """ETag of one representation of a grievance at its current updated_at"""
+    return f"{kind}-{version.id}-{version.updated_at.strftime('%Y%m%d%H%M%S%f')}"
+
+def is_not_modified(etag, last_modified):
+    """Check the request's If-None-Match, or failing that If-Modified-Since, against a version"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    return False
+
+def conditional_response(build_payload, etag, last_modified):
+    """Return 304 if the client's copy is current, otherwise the JSON from build_payload()"""
+    if is_not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Clients may keep the response but must revalidate it before use
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def get_visible_version(grievance_id):
+    """Get the version of a grievance the current user may see, or None"""
+    version = get_grievance_version(grievance_id)
+    if not version:
+        return None
+    if current_user.role != 'admin' and version.student_id != current_user.id:
+        return None
+    return version
+
+# Grievances
+
+@api_bp.route('/grievances')
+@api_login_required()
+def list_grievances():
+    """One page of grievances, newest first unless sort=oldest"""
+    filters = {
+        'status': request.args.get('status') or None,
+        'open_only': request.args.get('open') in ('1', 'true'),
+        'department_id': request.args.get('department', type=int),
+        'student_id': request.args.get('student', type=int)
+    }
+    if current_user.role != 'admin':
+        filters['student_id'] = current_user.id
+    options = {
+        'after': request.args.get('after') or None,
+        'before': request.args.get('before') or None,
+        'page_size': request.args.get('per_page', DEFAULT_PAGE_SIZE),
+        'sort': request.args.get('sort', 'newest')
+    }
+    try:
+        page = paginate_grievances(**filters, **options)
+    except ValueError as e:
+        return api_error(400, str(e))
+
+    args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    response = jsonify({
+        'grievances': [serialize_grievance(g) for g in page.grievances],
+        'per_page': page.page_size,
+        'sort': page.sort,
+        'next': url_for('api.list_grievances', **args, after=page.next_cursor) if page.next_cursor else None,
+        'prev': url_for('api.list_grievances', **args, before=page.prev_cursor) if page.prev_cursor else None
+    })
+    # A page changes when any grievance on it does, so hash its contents
+    response.add_etag()
+    if page.grievances:
+        response.last_modified = max(g.updated_at for g in page.grievances)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@api_bp.route('/grievances/<int:grievance_id>')
+@api_login_required()
+def grievance_detail(grievance_id):
+    """A grievance with its status updates and attachments"""
+    version = get_visible_version(grievance_id)
+    if not version:
+        return api_error(404, 'Grievance not found.')
+    return conditional_response(lambda: serialize_grievance_detail(get_grievance_detail(grievance_id)),
+                                grievance_etag('grievance', version), version.updated_at)
+
+@api_bp.route('/grievances/<int:grievance_id>/status-updates')
+@api_login_required()
+def grievance_status_updates(grievance_id):
+    """The status history of a grievance, oldest first"""
+    version = get_visible_version(grievance_id)
+    if not version:
+        return api_error(404, 'Grievance not found.')
+    return conditional_response(
+        lambda: {'status_updates': [serialize_status_update(s) for s in get_grievance_status_updates(grievance_id)]},
+        grievance_etag('status-updates', version), version.updated_at)
+
+@api_bp.route('/grievances/<int:grievance_id>/status', methods=['POST'])
+@api_login_required('admin')
+def update_status(grievance_id):
+    """
+    Change the status of a grievance from a JSON body with 'status' and an
+    optional 'note'. Send the grievance's ETag in If-Match to only apply the
+    change if nobody else has updated it since.
+    """
+    data = request.get_json(silent=True) or {}
+    new_status = data.get('status')
+    if not new_status or new_status not in STATUS_OPTIONS:
+        return api_error(400, f"status must be one of: {', '.join(STATUS_OPTIONS)}")
+
+    version = get_grievance_version(grievance_id)
+    if not version:
+        return api_error(404, 'Grievance not found.')
+    if request.if_match and not request.if_match.contains(grievance_etag('grievance', version)):
+        return api_error(412, 'The grievance has changed since it was read.')
+
+    try:
+        update_grievance_status(grievance_id, new_status, data.get('note', ''), status_label=STATUS_OPTIONS[new_status])
+    except ValueError as e:
+        return api_error(409, str(e))
+
+    version = get_grievance_version(grievance_id)
+    response = jsonify(serialize_grievance_detail(get_grievance_detail(grievance_id)))
+    response.set_etag(grievance_etag('grievance', version))
+    response.last_modified = version.updated_at
+    return response
+
+# Departments and statistics
+
+@api_bp.route('/departments')
+@api_login_required()
+def list_departments():
+    response = jsonify({'departments': [
+        {'id': d.id, 'name': d.name, 'description': d.description} for d in get_all_departments()
+    ]})
+    response.add_etag()
+    return response.make_conditional(request)
+
+@api_bp.route('/stats')
+@api_login_required()
+def stats():
+    """Grievance counts: overall for admins, the student's own for students"""
+    if current_user.role == 'admin':
+        payload = {
+            'total': count_grievances(),
+            'by_status': get_status_counts(),
+            'by_department': get_department_counts()
+        }
+    else:
+        by_status = get_student_status_counts(current_user.id)
+        payload = {'total': sum(by_status.values()), 'by_status': by_status}
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -1,10 +1,13 @@
+import logging
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from functools import wraps
-from application.models.db_utils import create_user, get_user_by_email, update_user
+from application.models.db_utils import create_user, get_user_by_email, get_user_by_id, update_user
 from application.models.models import User
+from application.models.passwords import needs_rehash
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
+logger = logging.getLogger(__name__)
 
 def role_required(role):
     """Decorator to restrict access based on user role"""
@@ -40,6 +43,12 @@ def login():
             user = get_user_by_email(email)
             
             if user and user.check_password(password):
+                if needs_rehash(user.password_hash):
+                    # Upgrade the stored hash to the current parameters
+                    try:
+                        update_user(user.id, {'password': password})
+                    except Exception as e:
+                        logger.warning("Could not rehash password for user %s: %s", user.id, e)
                 login_user(user)
                 flash('Login successful!', 'success')
                 
@@ -103,14 +112,15 @@ def logout():
 @auth_bp.route('/profile')
 @login_required
 def profile():
-    user = current_user
+    # current_user only holds the session fields, so load the full record
+    user = get_user_by_id(current_user.id)
     total_grievances = pending_grievances = resolved_grievances = 0
     if user.role == 'student':
-        from application.models.db_utils import get_student_grievances
-        grievances = get_student_grievances(user.id)
-        total_grievances = len(grievances)
-        pending_grievances = len([g for g in grievances if g.status == 'pending'])
-        resolved_grievances = len([g for g in grievances if g.status in ['resolved', 'closed']])
+        from application.models.db_utils import get_student_status_counts
+        status_counts = get_student_status_counts(user.id)
+        total_grievances = sum(status_counts.values())
+        pending_grievances = status_counts.get('pending', 0)
+        resolved_grievances = status_counts.get('resolved', 0) + status_counts.get('closed', 0)
     return render_template('auth/profile.html', user=user, total_grievances=total_grievances, pending_grievances=pending_grievances, resolved_grievances=resolved_grievances)
 
 @auth_bp.route('/profile/edit', methods=['POST'])
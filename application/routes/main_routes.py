@@ -1,8 +1,56 @@
-from flask import Blueprint, redirect, url_for
+from flask import Blueprint, redirect, url_for, send_file, abort
+from flask_login import login_required, current_user
+from application.models.db_utils import get_attachment_by_id
+from application.models.blob_store import get_attachment_file
+import mimetypes
+import os
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
     # Redirect to the login page when someone visits the root URL
-    return redirect(url_for('auth.login')) 
\ No newline at end of file
+    return redirect(url_for('auth.login'))
+
+# File types that browsers may display inline; anything else is downloaded
+INLINE_MIMETYPES = {'application/pdf', 'image/jpeg', 'image/png'}
+
+# Blobs are stored by content hash and never change, so they can be cached for a year
+BLOB_MAX_AGE = 365 * 24 * 60 * 60
+LEGACY_FILE_MAX_AGE = 60 * 60
+
+@main_bp.route('/attachments/<int:attachment_id>')
+@login_required
+def download_attachment(attachment_id):
+    """Serve an attachment to its student or to an admin"""
+    attachment = get_attachment_by_id(attachment_id)
+    if not attachment:
+        abort(404)
+    
+    # Students may only download attachments on their own grievances
+    if current_user.role != 'admin' and attachment.grievance.student_id != current_user.id:
+        abort(404)
+    
+    path = get_attachment_file(attachment)
+    if not os.path.isfile(path):
+        abort(404)
+    
+    mimetype = mimetypes.guess_type(attachment.filename)[0] or 'application/octet-stream'
+    
+    # send_file streams the file (with sendfile where the server supports it)
+    # and answers Range and If-None-Match requests with 206 and 304 responses
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=mimetype not in INLINE_MIMETYPES,
+        download_name=attachment.filename,
+        conditional=True,
+        etag=attachment.sha256 or True,
+        max_age=BLOB_MAX_AGE if attachment.blob_id else LEGACY_FILE_MAX_AGE
+    )
+    response.cache_control.private = True
+    response.cache_control.public = False
+    if attachment.blob_id:
+        response.cache_control.immutable = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
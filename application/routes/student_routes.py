@@ -1,16 +1,22 @@
+import logging
 from flask import Blueprint, render_template, redirect, url_for, request, flash, session, current_app
 from flask_login import current_user, login_required
 from application.routes.auth_routes import role_required
 from application.models.db_utils import (
-    create_grievance, get_student_grievances, get_grievance_by_id, 
-    get_all_departments, create_department
+    create_grievance, get_student_grievances, get_grievance_by_id, get_grievance_detail,
+    get_all_departments, create_department, get_grievance_upload_size, get_student_status_counts
 )
+from application.models.upload_utils import format_size, UploadTooLarge
+from application.models.blob_store import receive_upload, create_attachment
 from application.models.email_utils import send_new_grievance_notification
 from werkzeug.utils import secure_filename
-import os
 import uuid
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
+logger = logging.getLogger(__name__)
+
+# Most recent grievances listed on the student dashboard
+DASHBOARD_GRIEVANCE_LIMIT = 100
 
 # This list will serve as a fallback if no departments are defined in the database
 DEFAULT_DEPARTMENTS = [
@@ -33,6 +39,12 @@ DEFAULT_DEPARTMENTS = [
     'Student Representative Council (SRC)'
 ]
 
+@student_bp.app_errorhandler(413)
+def request_too_large(error):
+    """Send the user back to the form when an upload goes over MAX_CONTENT_LENGTH"""
+    flash(f'The uploaded files are too large. The limit is {format_size(current_app.config["MAX_CONTENT_LENGTH"])} per submission.', 'danger')
+    return redirect(request.referrer or url_for('student.dashboard'))
+
 def handle_file_upload(file, grievance_id):
     """
     Utility function to handle file upload validation and processing.
@@ -41,45 +53,42 @@ def handle_file_upload(file, grievance_id):
     if not file or not file.filename:
         return False, 'No file selected.', 'warning', None
     
-    print(f"Attempting to upload file: {file.filename} for grievance: {grievance_id}")
+    logger.debug("Uploading %s for grievance %s", file.filename, grievance_id)
         
     try:
-        # Add more detailed logging
-        print(f"File details - Name: {file.filename}, Size: {len(file.read())} bytes")
-        file.seek(0)  # Reset file pointer after reading
+        filename = secure_filename(file.filename)
+        if not filename:
+            raise ValueError('Invalid file name.')
         
-        # Create directory if it doesn't exist
-        upload_folder = os.path.join(current_app.root_path, 'uploads', str(grievance_id))
-        os.makedirs(upload_folder, exist_ok=True)
+        # The file may use whatever is left of the grievance's upload allowance
+        remaining = current_app.config['MAX_GRIEVANCE_UPLOAD_SIZE'] - get_grievance_upload_size(grievance_id)
+        if remaining <= 0:
+            raise ValueError(f'Attachments for a grievance may not exceed {format_size(current_app.config["MAX_GRIEVANCE_UPLOAD_SIZE"])} in total.')
+        max_bytes = min(current_app.config['MAX_ATTACHMENT_SIZE'], remaining)
         
-        # Save the file locally
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
+        # Stream the file into the blob store in chunks
+        try:
+            temp_path, file_size, sha256 = receive_upload(file.stream, max_bytes)
+        except UploadTooLarge:
+            if max_bytes < current_app.config['MAX_ATTACHMENT_SIZE']:
+                raise ValueError(f'Only {format_size(remaining)} of attachment space is left on this grievance.')
+            raise
         
-        # Create attachment record in database
-        from application.models.models import db, Attachment
-        attachment = Attachment(
-            filename=filename,
-            file_path=file_path,
-            grievance_id=grievance_id
-        )
-        db.session.add(attachment)
-        db.session.commit()
+        # Create attachment record pointing at the stored file
+        attachment = create_attachment(grievance_id, filename, temp_path, file_size, sha256)
         
-        # Return the local file path
-        relative_path = os.path.join('uploads', str(grievance_id), filename)
-        file_url = url_for('static', filename=relative_path, _external=True)
+        # Return the download URL
+        file_url = url_for('main.download_attachment', attachment_id=attachment.id, _external=True)
         
-        print(f"Upload successful, URL: {file_url}")
+        logger.info("Stored attachment %s (%d bytes) for grievance %s", filename, file_size, grievance_id)
         return True, f'Successfully uploaded {file.filename}', 'success', file_url
     except ValueError as ve:
         error_message = str(ve)
-        print(f"Validation error during upload: {error_message}")
+        logger.info("Rejected upload %s for grievance %s: %s", file.filename, grievance_id, error_message)
         return False, f'Validation error: {error_message}', 'warning', None
     except Exception as e:
         error_message = str(e)
-        print(f"Unexpected error during upload: {error_message}")
+        logger.exception("Upload of %s for grievance %s failed", file.filename, grievance_id)
         return False, f'An error occurred while uploading the file: {error_message}', 'danger', None
 
 @student_bp.route('/dashboard')
@@ -87,26 +96,21 @@ def handle_file_upload(file, grievance_id):
 @role_required('student')
 def dashboard():
     user_id = current_user.id
-    grievances = get_student_grievances(user_id)
+    grievances = get_student_grievances(user_id, limit=DASHBOARD_GRIEVANCE_LIMIT)
     
-    # Count grievances by status
+    # Count grievances by status in the database
     status_counts = {
         'pending': 0,
         'in_progress': 0,
         'resolved': 0,
         'closed': 0
     }
-    
-    for grievance in grievances:
-        status = grievance.status
-        if status in status_counts:
-            status_counts[status] += 1
-        else:
-            status_counts[status] = 1
+    status_counts.update(get_student_status_counts(user_id))
     
     return render_template('student/dashboard.html', 
                            grievances=grievances, 
-                           status_counts=status_counts)
+                           status_counts=status_counts,
+                           total_count=sum(status_counts.values()))
 
 @student_bp.route('/new-grievance', methods=['GET', 'POST'])
 @login_required
@@ -220,7 +224,7 @@ def new_grievance():
                 try:
                     send_new_grievance_notification(user_email, grievance_id)
                 except Exception as e:
-                    print(f"Error sending email notification: {str(e)}")
+                    logger.warning("Could not send the new grievance notification for grievance %s: %s", grievance_id, e)
                     # Don't show this error to the user as it's not critical
             
             # Show appropriate success message
@@ -232,10 +236,10 @@ def new_grievance():
             return redirect(url_for('student.grievance_detail', grievance_id=grievance_id))
             
         except ValueError as ve:
-            print(f"Validation error in new_grievance: {str(ve)}")
+            logger.info("Rejected grievance submission: %s", ve)
             flash(str(ve), 'danger')
         except Exception as e:
-            print(f"Error submitting grievance: {str(e)}")
+            logger.exception("Could not submit grievance")
             flash('An error occurred while submitting your grievance. Please try again.', 'danger')
         
         # If we get here, there was an error, so return to form with data
@@ -261,7 +265,7 @@ def new_grievance():
 @role_required('student')
 def grievance_detail(grievance_id):
     user_id = current_user.id
-    grievance = get_grievance_by_id(grievance_id)
+    grievance = get_grievance_detail(grievance_id)
     
     # Check if grievance exists and belongs to current user
     if not grievance or grievance.student_id != user_id:
@@ -282,11 +286,8 @@ def add_attachment(grievance_id):
         flash('Grievance not found.', 'danger')
         return redirect(url_for('student.dashboard'))
     
-    if 'file' not in request.files:
-        flash('No file selected.', 'warning')
-        return redirect(url_for('student.grievance_detail', grievance_id=grievance_id))
-    
-    file = request.files['file']
+    # The grievance detail form names its file input 'attachment'
+    file = request.files.get('attachment') or request.files.get('file')
     
     if not file or not file.filename:
         flash('No file selected.', 'warning')
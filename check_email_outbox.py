@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Email Outbox Check Script for DUT Student Grievance Management System
+
+This script starts a local SMTP stand-in, points EMAIL_BACKEND=smtp at it and
+drives the email outbox through process_outbox against an in-memory database.
+It checks that a status change commits its notification in the same
+transaction, that queued emails are delivered, and that emails the server
+refuses are retried with exponential backoff until they are given up on. It
+exits with status 1 if any check fails.
+
+Usage: python check_email_outbox.py
+"""
+
+import os
+import sys
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from email import message_from_bytes
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that keeps the messages it accepts in memory"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.refuse_recipients = False
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Answer one SMTP session, refusing recipients while the server is told to"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost SMTP stand-in')
+        recipients = []
+        for raw in self.rfile:
+            command = raw.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif verb in ('HELO', 'NOOP', 'MAIL'):
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                if self.server.refuse_recipients:
+                    self.reply('451 4.3.0 Mailbox temporarily unavailable')
+                else:
+                    recipients.append(command.split(':', 1)[1].strip('<> '))
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                self.server.messages.append((recipients, message_from_bytes(b''.join(lines))))
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('500 Command not recognised')
+
+def main():
+    print("\n" + "="*70)
+    print("DUT Student Grievance Management System - Email Outbox Check")
+    print("="*70)
+
+    server = SMTPStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # email_utils reads its settings when it is imported, so set them first
+    os.environ.update({
+        'EMAIL_BACKEND': 'smtp',
+        'EMAIL_HOST': '127.0.0.1',
+        'EMAIL_PORT': str(server.server_address[1]),
+        'EMAIL_USE_TLS': 'false',
+        'EMAIL_USER': '',
+        'EMAIL_PASSWORD': '',
+    })
+    from check_query_plans import create_app, create_sample_rows
+    from application.models.email_queue import (
+        enqueue_email, process_outbox, MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+    )
+    from application.models.email_utils import get_smtp_pool
+
+    failures = []
+    def check(label, passed, detail=''):
+        print(f"{'ok    ' if passed else 'FAILED'} {label}{f' ({detail})' if detail else ''}")
+        if not passed:
+            failures.append(label)
+
+    app, db = create_app()
+    with app.app_context():
+        from application.models.models import Grievance, EmailOutbox
+        from application.models.db_utils import update_grievance_status
+        db.create_all()
+        create_sample_rows(db)
+        grievance = Grievance.query.first()
+        student_email = grievance.student.email
+
+        # A status change and its notification are committed together
+        update_grievance_status(grievance.id, 'in_progress', 'Outbox check', status_label='In Progress')
+        db.session.remove()
+        queued = [(email.id, email.recipient) for email in EmailOutbox.query.all()]
+        check("status change queues its notification in the same commit",
+              len(queued) == 1 and queued[0][1] == student_email, f"{len(queued)} queued")
+
+        # A queued email is delivered to the SMTP server
+        process_outbox()
+        db.session.remove()
+        email = db.session.get(EmailOutbox, queued[0][0])
+        delivered = server.messages[-1] if server.messages else ([], {})
+        check("queued email is delivered", email.status == 'sent' and email.attempts == 1 and
+              delivered[0] == [student_email] and delivered[1]['Subject'] == email.subject,
+              f"status={email.status}, attempts={email.attempts}, {len(server.messages)} received")
+
+        # A refused email is retried later, waiting twice as long after each failure
+        server.refuse_recipients = True
+        email_id = enqueue_email(student_email, 'Outbox retry check', '<p>Retry check</p>')
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            started = datetime.utcnow()
+            process_outbox()
+            db.session.remove()
+            email = db.session.get(EmailOutbox, email_id)
+            if attempt < MAX_ATTEMPTS:
+                delay = (email.next_attempt_at - started).total_seconds()
+                expected = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+                check(f"refused email is retried after {expected}s (attempt {attempt})",
+                      email.status == 'pending' and email.attempts == attempt and email.last_error
+                      and expected - 1 <= delay <= expected + 1,
+                      f"status={email.status}, next attempt in {delay:.0f}s")
+                # Make it due again without waiting for the backoff
+                email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+                db.session.commit()
+            else:
+                check(f"refused email is given up on after {MAX_ATTEMPTS} attempts",
+                      email.status == 'failed' and email.attempts == MAX_ATTEMPTS,
+                      f"status={email.status}, last error: {email.last_error}")
+
+        # A refused recipient does not cost the pooled connection
+        server.refuse_recipients = False
+        connections = server.connections
+        enqueue_email(student_email, 'Outbox recovery check', '<p>Recovery check</p>')
+        process_outbox()
+        db.session.remove()
+        check("email after the refusals is delivered over the pooled connection",
+              EmailOutbox.query.filter_by(status='sent').count() == 2 and server.connections == connections,
+              f"{server.connections - connections} new connection(s)")
+
+    get_smtp_pool().close_all()
+    server.shutdown()
+
+    if failures:
+        print(f"\n{len(failures)} check(s) failed.")
+        sys.exit(1)
+    print("\nThe outbox delivers, retries and gives up as expected.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+"""
+HTTP Load Test Script for DUT Student Grievance Management System
+
+This script boots the real application with create_app() against a database
+seeded by application/models/seeding.py. It serves the app over HTTP on a
+local port and drives it with concurrent simulated sessions. Each student
+session logs in, opens the dashboard, opens the new grievance form, submits a
+grievance and returns to the dashboard. Each admin session logs in, opens the
+dashboard, the grievance list and the reports, and updates the status of a
+grievance.
+
+Every step states the status it expects and, for redirects, where to. A
+login that re-renders the form or a redirect back to the login page counts
+as an error, not as a fast success.
+
+For every route it reports the request count, errors, throughput, p50/p95/p99
+latency and the SQL statements per request, as JSON. Pass --compare with a
+previous report to exit with status 1 when a route's p95 latency or its mean
+number of statements grows beyond --tolerance.
+
+Usage: python check_load.py [--students 1000] [--grievances 20000] [--sessions 8] [--seconds 30] [--output report.json]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import logging
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import build_opener, HTTPCookieProcessor, HTTPRedirectHandler, Request
+
+PASSWORD = 'LoadTest@123456'
+
+def log(message):
+    """Progress goes to stderr so the JSON report can be piped"""
+    print(message, file=sys.stderr)
+
+def create_app(database):
+    """Create the real application for a SQLite database file, without the email worker"""
+    # Settings are read from the environment when application.config is imported
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(database)}'
+    os.environ['EMAIL_WORKER'] = 'off'
+    from application import create_app as create_portal_app
+    from application.models.models import db
+    return create_portal_app(), db
+
+def count_queries(app, db):
+    """Count the SQL statements of each request, grouped by endpoint"""
+    from flask import g, request, has_request_context
+    from sqlalchemy import event
+    counts = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.load_test_queries = g.get('load_test_queries', 0) + 1
+
+    @app.after_request
+    def record_queries(response):
+        key = f'{request.method} {request.endpoint}'
+        counts.setdefault(key, []).append(g.get('load_test_queries', 0))
+        return response
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return counts
+
+class NoRedirect(HTTPRedirectHandler):
+    """Report redirects as responses, so each request is timed on its own"""
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+class Session:
+    """One simulated browser: a cookie jar and timed requests"""
+    def __init__(self, base_url, results):
+        self.base_url = base_url
+        self.results = results
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), NoRedirect())
+
+    def request(self, route, path, data=None, expect=200, redirect_to=None):
+        """
+        Make a timed request. It succeeds only with the expected status and,
+        when redirect_to is given, a Location whose path starts with it.
+        """
+        body = urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(Request(self.base_url + path, data=body), timeout=60) as response:
+                response.read()
+                status, location = response.status, response.headers.get('Location')
+        except HTTPError as e:
+            e.read()
+            status, location = e.code, e.headers.get('Location')
+        elapsed = time.perf_counter() - started
+        ok = status == expect and (redirect_to is None or urlsplit(location or '').path.startswith(redirect_to))
+        self.results.append((route, elapsed, ok))
+        return ok
+
+def student_session(session, rng, seed, students, department_ids):
+    number = rng.randint(1, students)
+    if not session.request('POST auth.login', '/auth/login',
+                           {'email': f'load{seed}.{number}@dut4life.ac.za', 'password': PASSWORD},
+                           expect=302, redirect_to='/student/dashboard'):
+        return
+    session.request('GET student.dashboard', '/student/dashboard')
+    session.request('GET student.new_grievance', '/student/new-grievance')
+    session.request('POST student.new_grievance', '/student/new-grievance', {
+        'description': 'Load test grievance: my module results are still missing from the portal.',
+        'department': rng.choice(department_ids),
+        'query_category': 'Assessment & Exam-Related'
+    }, expect=302, redirect_to='/student/grievance/')
+    session.request('GET student.dashboard', '/student/dashboard')
+
+def admin_session(session, rng, seed, grievance_ids, statuses):
+    if not session.request('POST auth.login', '/auth/login',
+                           {'email': f'load{seed}.admin@dut.ac.za', 'password': PASSWORD},
+                           expect=302, redirect_to='/admin/dashboard'):
+        return
+    session.request('GET admin.dashboard', '/admin/dashboard')
+    session.request('GET admin.all_grievances', '/admin/grievances/all')
+    session.request('GET admin.reports', '/admin/reports')
+    grievance_id = rng.choice(grievance_ids)
+    session.request('POST admin.update_status', f'/admin/update-status/{grievance_id}',
+                    {'status': rng.choice(statuses), 'note': 'Load test status update'},
+                    expect=302, redirect_to=f'/admin/grievance/{grievance_id}')
+    session.request('GET admin.dashboard', '/admin/dashboard')
+
+def run_sessions(base_url, args, worker, deadline, results, department_ids, grievance_ids, statuses):
+    """Run one concurrent user: new sessions back to back until the deadline"""
+    rng = random.Random(args.seed * 1000 + worker)
+    is_admin = worker < max(1, round(args.sessions * args.admin_share))
+    while time.perf_counter() < deadline:
+        session = Session(base_url, results)
+        if is_admin:
+            admin_session(session, rng, args.seed, grievance_ids, statuses)
+        else:
+            student_session(session, rng, args.seed, args.students, department_ids)
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))]
+
+def build_report(args, results, query_counts, seconds):
+    routes = {}
+    for route in sorted({route for route, _, _ in results}):
+        latencies = sorted(elapsed for name, elapsed, _ in results if name == route)
+        errors = sum(1 for name, _, ok in results if name == route and not ok)
+        queries = query_counts.get(route, [])
+        routes[route] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput_rps': round(len(latencies) / seconds, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2),
+            'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'queries_max': max(queries) if queries else None,
+        }
+    return {
+        'settings': {'students': args.students, 'grievances': args.grievances, 'seed': args.seed,
+                     'sessions': args.sessions, 'admin_share': args.admin_share, 'seconds': seconds},
+        'totals': {'requests': len(results), 'errors': sum(1 for _, _, ok in results if not ok),
+                   'throughput_rps': round(len(results) / seconds, 2)},
+        'routes': routes,
+    }
+
+def compare_reports(report, baseline, tolerance):
+    """List the routes that got slower or issue more statements than in the baseline report"""
+    regressions = []
+    for route, current in report['routes'].items():
+        previous = baseline.get('routes', {}).get(route)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        # Background work such as the analytics refresh varies the counts a little
+        if current['queries_mean'] is not None and previous.get('queries_mean') is not None \
+                and current['queries_mean'] > previous['queries_mean'] * (1 + tolerance) + 0.5:
+            regressions.append(f"{route}: {previous['queries_mean']} -> {current['queries_mean']} statements per request")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the portal routes over HTTP.')
+    parser.add_argument('--students', type=int, default=1000, help='Students in the seeded dataset')
+    parser.add_argument('--grievances', type=int, default=20000, help='Grievances in the seeded dataset')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the dataset and the simulated sessions')
+    parser.add_argument('--database', help='Use this already seeded SQLite file instead of a temporary one')
+    parser.add_argument('--sessions', type=int, default=8, help='Concurrent simulated users')
+    parser.add_argument('--admin-share', type=float, default=0.25, help='Fraction of the users that are admins')
+    parser.add_argument('--seconds', type=float, default=30, help='Duration of the measured run')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of standard output')
+    parser.add_argument('--compare', help='Previous JSON report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed growth for --compare, as a fraction')
+    args = parser.parse_args()
+
+    log("\n" + "="*70)
+    log("DUT Student Grievance Management System - HTTP Load Test")
+    log("="*70)
+
+    directory = None
+    if args.database:
+        database = args.database
+    else:
+        directory = tempfile.mkdtemp(prefix='load-test-')
+        database = os.path.join(directory, 'load.db')
+    try:
+        app, db = create_app(database)
+        with app.app_context():
+            from application.models.seeding import seed_dataset, admin_email
+            from application.models.models import User, Department, Grievance
+            if not User.query.filter_by(email=admin_email(args.seed)).first():
+                log(f"\nSeeding {args.students} students and {args.grievances} grievances:")
+                seed_dataset(args.students, args.grievances, seed=args.seed, password=PASSWORD, log=log)
+            department_ids = [d.id for d in Department.query.all()]
+            grievance_ids = [g_id for g_id, in db.session.query(Grievance.id)]
+            from application.routes.admin_routes import STATUS_OPTIONS
+            db.session.remove()
+
+        query_counts = count_queries(app, db)
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        log(f"\nRunning {args.sessions} concurrent sessions for {args.seconds:g}s against {base_url}")
+        results = []
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        workers = [threading.Thread(target=run_sessions, args=(base_url, args, worker, deadline, results,
+                                                               department_ids, grievance_ids, list(STATUS_OPTIONS)))
+                   for worker in range(args.sessions)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - started
+        server.shutdown()
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    report = build_report(args, results, query_counts, seconds)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        log(f"\nReport written to {args.output}")
+    else:
+        print(output)
+
+    log(f"\n{report['totals']['requests']} requests, {report['totals']['errors']} errors, "
+        f"{report['totals']['throughput_rps']} requests/s")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_reports(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            log(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        log("No regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Query Count Check Script for DUT Student Grievance Management System
+
+This script loads grievances with short and long status histories through
+get_grievance_detail, touches everything the detail pages render, and checks
+that the number of SQL statements stays the same. It exits with status 1 if
+the count grows with the history or goes over the budget, which means a lazy
+load has crept back into the detail pages.
+
+Usage: python check_query_counts.py
+"""
+
+import sys
+from sqlalchemy import event
+from check_query_plans import create_app, create_sample_rows
+
+# Statements allowed for one grievance detail page: the grievance with its
+# department and student, then its status updates and its attachments
+DETAIL_QUERY_BUDGET = 3
+
+def render_detail(grievance_id):
+    """Load a grievance and read every attribute the detail templates use"""
+    from application.models.db_utils import get_grievance_detail
+    grievance = get_grievance_detail(grievance_id)
+    student = grievance.student
+    department = grievance.department
+    values = [grievance.title, student.display_name, student.email, department.name]
+    for status_update in grievance.status_updates:
+        values.extend([status_update.status, status_update.note, status_update.created_at])
+    for attachment in grievance.attachments:
+        values.extend([attachment.filename, attachment.uploaded_at])
+    return values
+
+def count_queries(db, grievance_id):
+    """Return the number of statements issued to render one grievance"""
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    db.session.remove()
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        render_detail(grievance_id)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+        db.session.remove()
+    return len(statements)
+
+def main():
+    print("\n" + "="*70)
+    print("DUT Student Grievance Management System - Query Count Check")
+    print("="*70)
+    app, db = create_app()
+    with app.app_context():
+        from application.models.models import Grievance, StatusUpdate, Attachment
+        db.create_all()
+        create_sample_rows(db)
+        short = Grievance.query.first()
+
+        long = Grievance(title='', description='Query count check grievance', query_category='Other',
+                         student_id=short.student_id, department_id=short.department_id)
+        db.session.add(long)
+        for i in range(50):
+            db.session.add(StatusUpdate(grievance=long, status='in_progress', note=f'Update {i}'))
+        for i in range(10):
+            db.session.add(Attachment(grievance=long, filename=f'file{i}.pdf', file_path=f'uploads/file{i}.pdf'))
+        db.session.commit()
+        short_id, long_id = short.id, long.id
+
+        short_count = count_queries(db, short_id)
+        long_count = count_queries(db, long_id)
+
+    print(f"Grievance with 1 status update:   {short_count} queries")
+    print(f"Grievance with 50 status updates: {long_count} queries")
+    if short_count != long_count or long_count > DETAIL_QUERY_BUDGET:
+        print(f"\nFAILED: detail pages must use a fixed number of queries (budget {DETAIL_QUERY_BUDGET}).")
+        sys.exit(1)
+    print("\nDetail page query count is fixed.")
+
+if __name__ == "__main__":
+    main()
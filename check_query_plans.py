@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Query Plan Check Script for DUT Student Grievance Management System
+
+This script runs the grievance queries in db_utils against a SQLite database
+and uses EXPLAIN QUERY PLAN to check that every statement they issue finds its
+rows through an index instead of scanning a whole table. It exits with status 1
+if any query falls back to a full scan, so it can be run after changing the
+models, the migrations or the queries.
+
+Usage: python check_query_plans.py [--database instance/app.db]
+"""
+
+import os
+import sys
+import argparse
+from datetime import timedelta
+from flask import Flask
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Tables that grow with usage and must never be scanned in full
+CHECKED_TABLES = ('grievances', 'status_updates', 'attachments')
+
+def create_app(database=None):
+    """Create a Flask application for database access"""
+    app = Flask(__name__)
+    if database:
+        db_path = os.path.abspath(database)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    from application.models.models import db
+    db.init_app(app)
+    return app, db
+
+def create_sample_rows(db):
+    """Create the rows the checks need to follow relationships and cursors"""
+    from application.models.models import User, Department, Grievance, StatusUpdate
+    student = User(email='plan-check@dut4life.ac.za', display_name='Plan Check', role='student')
+    student.set_password('plan-check')
+    department = Department(name='Plan Check')
+    grievance = Grievance(title='', description='Plan check grievance', query_category='Other',
+                          student=student, department=department)
+    db.session.add_all([student, department, grievance,
+                        StatusUpdate(grievance=grievance, status='pending', note='Grievance submitted')])
+    db.session.commit()
+
+def get_checks(sample):
+    """Return a list of (label, callable) pairs covering the db_utils grievance queries"""
+    from application.models import db_utils, reports, analytics, exports
+    cursor = db_utils.encode_cursor(sample)
+    grievance_id, student_id, department_id = sample.id, sample.student_id, sample.department_id
+
+    month_filters = reports.ReportFilters(None, None, None, None, 'month')
+    day_filters = reports.ReportFilters(sample.created_at - timedelta(days=3), sample.created_at + timedelta(days=3),
+                                        None, None, 'day')
+
+    def report_counts(filters):
+        return (reports.get_trend_counts(filters), reports.get_status_breakdown(filters),
+                reports.get_department_breakdown(filters))
+
+    def relationship_loads():
+        grievance = db_utils.get_grievance_by_id(grievance_id)
+        return grievance.status_updates, grievance.attachments, grievance.department, grievance.student
+
+    return [
+        ('get_student_grievances', lambda: db_utils.get_student_grievances(student_id)),
+        ('get_department_grievances', lambda: db_utils.get_department_grievances(department_id)),
+        ('get_resolved_grievances', db_utils.get_resolved_grievances),
+        ('grievance relationship loads', relationship_loads),
+        ('get_grievance_detail', lambda: db_utils.get_grievance_detail(grievance_id)),
+        ('get_recent_grievances', db_utils.get_recent_grievances),
+        ('count_grievances', db_utils.count_grievances),
+        ('get_status_counts', db_utils.get_status_counts),
+        ('get_department_counts', db_utils.get_department_counts),
+        ('get_student_status_counts', lambda: db_utils.get_student_status_counts(student_id)),
+        ('paginate_grievances', db_utils.paginate_grievances),
+        ('paginate_grievances (oldest)', lambda: db_utils.paginate_grievances(sort='oldest')),
+        ('paginate_grievances (after)', lambda: db_utils.paginate_grievances(after=cursor)),
+        ('paginate_grievances (before)', lambda: db_utils.paginate_grievances(before=cursor)),
+        ('paginate_grievances (open)', lambda: db_utils.paginate_grievances(open_only=True)),
+        ('paginate_grievances (status)', lambda: db_utils.paginate_grievances(status='resolved')),
+        ('paginate_grievances (department)', lambda: db_utils.paginate_grievances(department_id=department_id)),
+        ('report by month', lambda: report_counts(month_filters)),
+        ('report by week', lambda: report_counts(month_filters._replace(bucket='week'))),
+        ('report by day, partial months', lambda: report_counts(day_filters)),
+        ('report by day, department', lambda: report_counts(day_filters._replace(department_id=department_id))),
+        ('report by day, status', lambda: report_counts(day_filters._replace(status='pending'))),
+        ('bucket count without a start', lambda: reports.check_bucket_count(day_filters._replace(start=None))),
+        ('bucket count without a start, department and status', lambda: reports.check_bucket_count(
+            day_filters._replace(start=None, department_id=department_id, status='pending'))),
+        ('refresh_metrics (incremental)', analytics.refresh_metrics),
+        ('time in status by department', lambda: analytics.get_status_durations_by_group(month_filters)),
+        ('time in status by category', lambda: analytics.get_status_durations_by_group(month_filters, 'category')),
+        ('SLA summary, status', lambda: analytics.get_sla_summary(month_filters._replace(status='pending'))),
+        ('export', lambda: list(exports.query_export_rows(exports.ExportFilters(None, None, None, None, None)))),
+        ('export by department', lambda: list(exports.query_export_rows(
+            exports.ExportFilters(day_filters.start, day_filters.end, department_id, None, None)))),
+    ]
+
+def full_scans(connection, statement, parameters):
+    """Return the EXPLAIN QUERY PLAN lines that scan a checked table without an index"""
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    scans = []
+    for row in rows:
+        detail = row[-1]
+        words = detail.split()
+        if not words or words[0] != 'SCAN' or 'USING' in words:
+            continue
+        table = words[2] if len(words) > 2 and words[1] == 'TABLE' else words[1]
+        if table in CHECKED_TABLES:
+            scans.append(detail)
+    return scans
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that grievance queries use indexes.')
+    parser.add_argument('--database', help='SQLite database file to check (defaults to a fresh in-memory schema)')
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("DUT Student Grievance Management System - Query Plan Check")
+    print("="*70)
+    app, db = create_app(args.database)
+    failures = 0
+    with app.app_context():
+        if not args.database:
+            db.create_all()
+            create_sample_rows(db)
+
+        from application.models.models import Grievance
+        sample = Grievance.query.order_by(Grievance.id).first()
+        if not sample:
+            print("The database has no grievances to check against. Run without --database instead.")
+            sys.exit(1)
+        checks = get_checks(sample)
+
+        captured = []
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                captured.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', capture)
+
+        for label, check in checks:
+            db.session.remove()
+            check()
+            db.session.remove()
+            statements, captured[:] = list(captured), []
+            label_failures = 0
+            with db.engine.connect() as connection:
+                for statement, parameters in statements:
+                    for scan in full_scans(connection, statement, parameters):
+                        label_failures += 1
+                        print(f"FULL SCAN  {label}: {scan}")
+                        print(f"           {' '.join(statement.split())}")
+            if not label_failures:
+                print(f"ok         {label} ({len(statements)} statement(s))")
+            failures += label_failures
+
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    if failures:
+        print(f"\n{failures} full table scan(s) found.")
+        sys.exit(1)
+    print("\nAll checked queries use an index.")
+
+if __name__ == "__main__":
+    main()
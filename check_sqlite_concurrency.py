@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""
+SQLite Concurrency Benchmark for DUT Student Grievance Management System
+
+This script runs a mixed load against a temporary SQLite database: writer
+processes submit grievances with create_grievance while reader processes load
+the admin dashboard queries in one read transaction, each with its own
+connection like a gunicorn worker. It runs once with SQLite's default rollback
+journal (journal_mode=DELETE, synchronous=FULL) and once with the WAL settings
+from application/models/sqlite_tuning.py. Both runs use the same busy timeout
+and cache settings, so only the journal mode and synchronous differ. It
+reports the throughput and latency of each run and how many operations failed
+with "database is locked".
+
+With the rollback journal a writer has to wait for every open read
+transaction before it can commit, and readers wait while it does; the busy
+timeout hides this as latency. Pass --busy-timeout 0 to see it as "database
+is locked" errors instead.
+
+Usage: python check_sqlite_concurrency.py [--seconds 10] [--readers 4] [--writers 2] [--busy-timeout 5000]
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from flask import Flask
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Settings of each run; everything else comes from sqlite_tuning's defaults
+MODES = {
+    'default': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'tuned': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'},
+}
+
+def create_app(database, mode, busy_timeout):
+    """Create a Flask application for database access with the settings of a run"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_BUSY_TIMEOUT'] = busy_timeout
+    app.config.update(MODES[mode])
+    from application.models.models import db
+    from application.models.sqlite_tuning import init_sqlite_tuning
+    db.init_app(app)
+    init_sqlite_tuning(app)
+    return app, db
+
+def create_sample_rows(db, grievances=500):
+    """Create a student, departments and some grievances to read"""
+    from application.models.models import User, Department
+    from application.models import db_utils
+    student = User(email='bench@dut4life.ac.za', display_name='Benchmark', role='student')
+    student.password_hash = 'benchmark'
+    departments = [Department(name=f'Benchmark {i}') for i in range(5)]
+    db.session.add_all([student, *departments])
+    db.session.commit()
+    for i in range(grievances):
+        db_utils.create_grievance(student.id, f'Grievance {i}', 'Benchmark grievance',
+                                  departments[i % 5].id, 'Other')
+    return student.id, [d.id for d in departments]
+
+def run_worker(database, mode, busy_timeout, role, index, seconds, student_id, department_ids):
+    """Run one reader or writer process until the time is up and return its results"""
+    from application.models import db_utils
+    app, db = create_app(database, mode, busy_timeout)
+    result = {'reads': 0, 'writes': 0, 'locked': 0, 'latencies': []}
+    deadline = time.perf_counter() + seconds
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if role == 'reader':
+                    # pysqlite only opens transactions for writes, so begin one
+                    # to read the whole dashboard from a single snapshot
+                    db.session.execute(text('BEGIN'))
+                    db_utils.count_grievances()
+                    db_utils.get_status_counts()
+                    db_utils.get_department_counts()
+                    db_utils.get_recent_grievances()
+                    db.session.commit()
+                    result['reads'] += 1
+                else:
+                    db_utils.create_grievance(student_id, 'Load test', 'Benchmark grievance',
+                                              department_ids[index % len(department_ids)], 'Other')
+                    result['writes'] += 1
+                result['latencies'].append(time.perf_counter() - started)
+            except OperationalError:
+                result['locked'] += 1
+            finally:
+                db.session.remove()
+    return result
+
+def run_load(database, mode, busy_timeout, seconds, readers, writers, student_id, department_ids):
+    """Run reader and writer processes at the same time and combine their results"""
+    jobs = [('reader', i) for i in range(readers)] + [('writer', i) for i in range(writers)]
+    # Each process stands in for a gunicorn worker with its own connection
+    with multiprocessing.get_context('fork').Pool(len(jobs)) as pool:
+        results = pool.starmap(run_worker, [(database, mode, busy_timeout, role, index, seconds,
+                                             student_id, department_ids) for role, index in jobs])
+    totals = {'reads': 0, 'writes': 0, 'locked': 0}
+    latencies = []
+    for result in results:
+        latencies.extend(result.pop('latencies'))
+        for key, value in result.items():
+            totals[key] += value
+    latencies.sort()
+    totals['p95'] = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    totals['max'] = latencies[-1] if latencies else 0
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare SQLite throughput with and without WAL tuning.')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+    parser.add_argument('--readers', type=int, default=4, help='Number of dashboard reader processes')
+    parser.add_argument('--writers', type=int, default=2, help='Number of grievance writer processes')
+    parser.add_argument('--busy-timeout', type=int, default=5000,
+                        help='Milliseconds to wait for a lock in both runs; 0 fails at once with "database is locked"')
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("DUT Student Grievance Management System - SQLite Concurrency Benchmark")
+    print("="*70)
+
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    try:
+        from application.models.sqlite_tuning import read_sqlite_pragmas
+        results, settings = {}, {}
+        for mode in MODES:
+            database = os.path.join(directory, f'{mode}.db')
+            app, db = create_app(database, mode, args.busy_timeout)
+            with app.app_context():
+                db.create_all()
+                student_id, department_ids = create_sample_rows(db)
+                with db.engine.connect() as connection:
+                    settings[mode] = read_sqlite_pragmas(connection.connection.dbapi_connection)
+                db.session.remove()
+                db.engine.dispose()
+            results[mode] = run_load(database, mode, args.busy_timeout, args.seconds, args.readers, args.writers,
+                                     student_id, department_ids)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"\n{args.readers} reader(s), {args.writers} writer(s), {args.seconds:g}s per run, "
+          f"busy timeout {args.busy_timeout} ms")
+    print(f"{'mode':<10} {'reads/s':>10} {'writes/s':>10} {'p95 ms':>10} {'max ms':>10} {'locked':>10}")
+    for mode, counts in results.items():
+        print(f"{mode:<10} {counts['reads'] / args.seconds:>10.1f} {counts['writes'] / args.seconds:>10.1f} "
+              f"{counts['p95'] * 1000:>10.1f} {counts['max'] * 1000:>10.1f} {counts['locked']:>10}")
+    print()
+    for mode, values in settings.items():
+        print(f"{mode:<10} " + ', '.join(f"{name}={value}" for name, value in values.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Startup Time Check Script for DUT Student Grievance Management System
+
+This script boots the application in fresh Python processes, the way each
+gunicorn worker does on a cold start, and reports the median time spent in
+each phase of create_app (import, config, extensions, database, blueprints).
+It measures the normal startup and the FAST_STARTUP mode side by side.
+
+Usage: python check_startup_time.py [--runs 5]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Run in a fresh interpreter so nothing is imported or cached already
+BOOT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from application import create_app
+app = create_app()
+total = time.perf_counter() - started
+phases = dict(app.extensions['startup_timer'].phases)
+phases['total'] = total
+print(json.dumps(phases))
+"""
+
+MODES = (('normal', 'false'), ('fast', 'true'))
+
+def boot(fast_startup):
+    """Start the application once in a new process and return its phase timings"""
+    env = dict(os.environ, FAST_STARTUP=fast_startup, STARTUP_REPORT='false', EMAIL_WORKER='off')
+    output = subprocess.run([sys.executable, '-c', BOOT_SCRIPT], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure application cold-start time.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to measure per mode')
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("DUT Student Grievance Management System - Startup Time Check")
+    print("="*70)
+
+    results = {}
+    for mode, fast_startup in MODES:
+        runs = [boot(fast_startup) for _ in range(args.runs)]
+        results[mode] = {phase: statistics.median(run[phase] for run in runs) for phase in runs[0]}
+
+    phases = list(results['normal'])
+    print(f"{'phase':<12}" + ''.join(f"{mode:>12}" for mode, _ in MODES))
+    for phase in phases:
+        print(f"{phase:<12}" + ''.join(f"{results[mode][phase] * 1000:>10.1f}ms" for mode, _ in MODES))
+
+    saved = results['normal']['total'] - results['fast']['total']
+    print(f"\nFAST_STARTUP saves {saved * 1000:.1f}ms per worker (median of {args.runs} runs).")
+
+if __name__ == "__main__":
+    main()
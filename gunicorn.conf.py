@@ -0,0 +1,36 @@
+"""
+Gunicorn settings for the DUT Student Grievance Management System.
+
+Workers and threads come from the same WEB_CONCURRENCY and GUNICORN_THREADS
+variables that application/config.py uses to size each worker's database
+connection pool, so the two cannot drift apart.
+
+Each worker writes its Prometheus metrics to PROMETHEUS_MULTIPROC_DIR, which
+is emptied when gunicorn starts, so /metrics reports the totals of all
+workers (see application/models/metrics.py).
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Must be set before the workers import prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'portal-metrics'))
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 600))
+
+def on_starting(server):
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    from application.config import get_config
+    config = get_config()
+    per_worker = config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW
+    server.log.info(f"Database connections: up to {per_worker} per worker, {per_worker * workers} in total")
+
+def child_exit(server, worker):
+    # Drop the live gauges of the exited worker; its counters and histograms are kept
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
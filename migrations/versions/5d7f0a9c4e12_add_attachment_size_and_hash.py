@@ -0,0 +1,28 @@
+"""Add size and hash to attachments
+
+Revision ID: 5d7f0a9c4e12
+Revises: c3a81f5e2b90
+Create Date: 2026-10-18 14:05:51.220734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7f0a9c4e12'
+down_revision = 'c3a81f5e2b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('file_size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.drop_column('sha256')
+        batch_op.drop_column('file_size')
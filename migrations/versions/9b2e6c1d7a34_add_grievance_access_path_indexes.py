@@ -0,0 +1,46 @@
+"""Add indexes for the grievance access paths
+
+Revision ID: 9b2e6c1d7a34
+Revises: 4f654bdd8d8c
+Create Date: 2026-10-18 09:12:03.418265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2e6c1d7a34'
+down_revision = '4f654bdd8d8c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('grievances', schema=None) as batch_op:
+        batch_op.create_index('ix_grievances_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_grievances_status_created_at', ['status', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_grievances_department_created_at', ['department_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_grievances_department_status_created_at', ['department_id', 'status', 'created_at'], unique=False)
+        batch_op.create_index('ix_grievances_student_created_at', ['student_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('status_updates', schema=None) as batch_op:
+        batch_op.create_index('ix_status_updates_grievance_created_at', ['grievance_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_attachments_grievance_id'), ['grievance_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_attachments_grievance_id'))
+
+    with op.batch_alter_table('status_updates', schema=None) as batch_op:
+        batch_op.drop_index('ix_status_updates_grievance_created_at')
+
+    with op.batch_alter_table('grievances', schema=None) as batch_op:
+        batch_op.drop_index('ix_grievances_student_created_at')
+        batch_op.drop_index('ix_grievances_department_status_created_at')
+        batch_op.drop_index('ix_grievances_department_created_at')
+        batch_op.drop_index('ix_grievances_status_created_at')
+        batch_op.drop_index('ix_grievances_created_at_id')
@@ -0,0 +1,46 @@
+"""Add grievance_stats rollup table
+
+Revision ID: a7c3e9d21f45
+Revises: e84b2d6f1c07
+Create Date: 2026-10-18 16:05:42.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d21f45'
+down_revision = 'e84b2d6f1c07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # create_app() may already have created the table with db.create_all()
+    if not sa.inspect(bind).has_table('grievance_stats'):
+        op.create_table('grievance_stats',
+        sa.Column('department_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('month', sa.String(length=7), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+        sa.PrimaryKeyConstraint('department_id', 'status', 'month')
+        )
+
+    # Count the existing grievances
+    if bind.dialect.name == 'postgresql':
+        month = "to_char(created_at, 'YYYY-MM')"
+    else:
+        month = "strftime('%Y-%m', created_at)"
+    op.execute('DELETE FROM grievance_stats')
+    op.execute(
+        'INSERT INTO grievance_stats (department_id, status, month, count) '
+        f'SELECT department_id, status, {month}, COUNT(*) FROM grievances '
+        f'GROUP BY department_id, status, {month}'
+    )
+
+
+def downgrade():
+    op.drop_table('grievance_stats')
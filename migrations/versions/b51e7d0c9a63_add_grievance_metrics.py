@@ -0,0 +1,55 @@
+"""Add grievance_metrics and grievance_status_durations tables
+
+Revision ID: b51e7d0c9a63
+Revises: a7c3e9d21f45
+Create Date: 2026-10-18 17:20:11.604918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b51e7d0c9a63'
+down_revision = 'a7c3e9d21f45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The tables are filled by `flask analytics refresh` or the reports page
+    inspector = sa.inspect(op.get_bind())
+    # create_app() may already have created the tables with db.create_all()
+    if not inspector.has_table('grievance_metrics'):
+        op.create_table('grievance_metrics',
+        sa.Column('grievance_id', sa.Integer(), nullable=False),
+        sa.Column('department_id', sa.Integer(), nullable=False),
+        sa.Column('query_category', sa.String(length=100), nullable=False),
+        sa.Column('submitted_at', sa.DateTime(), nullable=False),
+        sa.Column('first_response_seconds', sa.Float(), nullable=True),
+        sa.Column('resolution_seconds', sa.Float(), nullable=True),
+        sa.Column('last_update_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['grievance_id'], ['grievances.id'], ),
+        sa.PrimaryKeyConstraint('grievance_id')
+        )
+        with op.batch_alter_table('grievance_metrics', schema=None) as batch_op:
+            batch_op.create_index('ix_grievance_metrics_department_submitted_at', ['department_id', 'submitted_at'], unique=False)
+            batch_op.create_index('ix_grievance_metrics_last_update_id', ['last_update_id'], unique=False)
+
+    if not inspector.has_table('grievance_status_durations'):
+        op.create_table('grievance_status_durations',
+        sa.Column('grievance_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('seconds', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['grievance_id'], ['grievance_metrics.grievance_id'], ),
+        sa.PrimaryKeyConstraint('grievance_id', 'status')
+        )
+
+
+def downgrade():
+    op.drop_table('grievance_status_durations')
+    with op.batch_alter_table('grievance_metrics', schema=None) as batch_op:
+        batch_op.drop_index('ix_grievance_metrics_last_update_id')
+        batch_op.drop_index('ix_grievance_metrics_department_submitted_at')
+
+    op.drop_table('grievance_metrics')
@@ -0,0 +1,41 @@
+"""Track grievances whose metrics need recomputing
+
+Revision ID: d6f2a4c8e913
+Revises: b51e7d0c9a63
+Create Date: 2026-10-18 08:05:42.187350
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f2a4c8e913'
+down_revision = 'b51e7d0c9a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing grievances start out stale, so the next refresh recomputes them all
+    inspector = sa.inspect(op.get_bind())
+    columns = [column['name'] for column in inspector.get_columns('grievances')]
+    with op.batch_alter_table('grievances', schema=None) as batch_op:
+        if 'metrics_stale' not in columns:
+            batch_op.add_column(sa.Column('metrics_stale', sa.Boolean(), server_default=sa.true(), nullable=False))
+            batch_op.create_index('ix_grievances_metrics_stale', ['metrics_stale'], unique=False)
+
+    # The refresh no longer looks for status update ids above a watermark
+    indexes = [index['name'] for index in inspector.get_indexes('grievance_metrics')]
+    if 'ix_grievance_metrics_last_update_id' in indexes:
+        with op.batch_alter_table('grievance_metrics', schema=None) as batch_op:
+            batch_op.drop_index('ix_grievance_metrics_last_update_id')
+
+
+def downgrade():
+    with op.batch_alter_table('grievance_metrics', schema=None) as batch_op:
+        batch_op.create_index('ix_grievance_metrics_last_update_id', ['last_update_id'], unique=False)
+
+    with op.batch_alter_table('grievances', schema=None) as batch_op:
+        batch_op.drop_index('ix_grievances_metrics_stale')
+        batch_op.drop_column('metrics_stale')
@@ -0,0 +1,44 @@
+"""Add content-addressed blobs for attachments
+
+Revision ID: e84b2d6f1c07
+Revises: 5d7f0a9c4e12
+Create Date: 2026-10-18 15:32:10.554906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e84b2d6f1c07'
+down_revision = '5d7f0a9c4e12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() may already have created the table with db.create_all()
+    if not sa.inspect(op.get_bind()).has_table('blobs'):
+        op.create_table('blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256')
+        )
+
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_attachments_blob_id'), ['blob_id'], unique=False)
+        batch_op.create_foreign_key('fk_attachments_blob_id_blobs', 'blobs', ['blob_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_attachments_blob_id_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_attachments_blob_id'))
+        batch_op.drop_column('blob_id')
+
+    op.drop_table('blobs')
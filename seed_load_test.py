@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Load Test Seeding Script for DUT Student Grievance Management System
+
+This script grows a database to a chosen size for performance tests, using
+the bulk seeding engine in application/models/seeding.py. Students,
+grievances and status histories are written in batched inserts with one
+shared password hash, so tens of thousands of grievances take seconds rather
+than hours. The same --seed, sizes and --until always produce the same data.
+
+Every generated account uses the password given by --password. The admin of
+the dataset is load<seed>.admin@dut.ac.za and the students are
+load<seed>.<n>@dut4life.ac.za.
+
+Usage: python seed_load_test.py [--students 1000] [--grievances 10000] [--seed 1] [--database instance/app.db]
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+from flask import Flask
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+def create_app(database):
+    """Create a Flask application for database access, hashing passwords like the web app"""
+    from application.config import get_config
+    app = Flask(__name__)
+    app.config.from_object(get_config())
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(database)}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+    from application.models.models import db
+    from application.models.sqlite_tuning import init_sqlite_tuning
+    db.init_app(app)
+    init_sqlite_tuning(app)
+    return app, db
+
+def main():
+    parser = argparse.ArgumentParser(description='Add a generated dataset for performance tests.')
+    parser.add_argument('--students', type=int, default=1000, help='Number of students to create')
+    parser.add_argument('--grievances', type=int, default=10000, help='Number of grievances to create')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed; each seed adds its own users')
+    parser.add_argument('--days', type=int, default=365, help='Spread submissions over this many days')
+    parser.add_argument('--until', help='Last day of the submissions (YYYY-MM-DD, default today)')
+    parser.add_argument('--password', default='LoadTest@123456', help='Password of every generated account')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per insert statement')
+    parser.add_argument('--database', default=os.path.join('instance', 'app.db'), help='SQLite database file')
+    args = parser.parse_args()
+    until = datetime.strptime(args.until, '%Y-%m-%d') if args.until else None
+
+    print("\n" + "="*70)
+    print("DUT Student Grievance Management System - Load Test Seeder")
+    print("="*70)
+
+    app, db = create_app(args.database)
+    with app.app_context():
+        from application.models.seeding import seed_dataset, count_rows, admin_email
+        if not os.path.exists(args.database):
+            print(f"\nCreating a new database at {os.path.abspath(args.database)}")
+            db.create_all()
+
+        print(f"\nSeeding {args.students} students and {args.grievances} grievances (seed {args.seed}):")
+        try:
+            result = seed_dataset(args.students, args.grievances, seed=args.seed, days=args.days, until=until,
+                                  password=args.password, batch_size=args.batch_size)
+        except ValueError as e:
+            print(f"\n❌ {e}. Use another --seed.")
+            sys.exit(1)
+
+        print(f"\n✅ Added {result['grievances']} grievances with {result['status_updates']} status updates "
+              f"in {result['seconds']:.1f}s")
+        print(f"   Rebuilt {result['stat_counters']} grievance_stats counters and "
+              f"{result['grievance_metrics']} grievance metrics")
+        totals = count_rows()
+        print(f"   The database now has {totals['users']} users, {totals['grievances']} grievances "
+              f"and {totals['status_updates']} status updates")
+        print(f"\nAdmin login: {admin_email(args.seed)} / {args.password}")
+
+if __name__ == "__main__":
+    main()